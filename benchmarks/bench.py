@@ -0,0 +1,282 @@
+# Benchmarks for the hot paths: searching, formatting, and the cost watch() adds to each write.
+#
+#  python benchmarks/bench.py                        # Run everything
+#  python benchmarks/bench.py -k watch               # Only benchmarks with 'watch' in the name
+#  python benchmarks/bench.py --save baseline.json   # Store the results
+#  python benchmarks/bench.py --compare baseline.json  # Show the change from stored results
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / 'src'
+sys.path.insert(0, str(SRC))
+
+from printi.printi import Printi  # noqa: E402
+
+BENCHMARKS = {}
+
+SEED = 1234
+
+KNOWN_HITS = [
+    math.pi / 3, math.e ** 2, math.sqrt(5) / 2, 1 - math.pi, 0.5641895835477563, 2.3333333333333335,
+    36.075979777132, 123 - 3 * math.pi ** 4 / 5, math.sin(math.pi / 4), -2.4674011002723395,
+]
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.removeprefix('bench_')] = func
+    return func
+
+
+def random_floats(n: int) -> list[float]:
+    rng = random.Random(SEED)
+    return [rng.random() * rng.choice([1, 10, 1000]) for _ in range(n)]
+
+
+def log_lines(n: int) -> list[str]:
+    # Something like the output of a training loop, with the odd interesting number
+    rng = random.Random(SEED)
+    lines = []
+    for i in range(n):
+        value = rng.choice(KNOWN_HITS) if i % 10 == 0 else rng.random()
+        lines.append(f'step={i} loss={rng.random():.6f} lr=0.001 value={value} elapsed={rng.random() * 100}\n')
+    return lines
+
+
+# Each benchmark returns (run, ops): a function to time, and how many operations
+# one call of it does. Anything done before returning isn't timed.
+
+@benchmark
+def bench_find_representation_cold():
+    nums = random_floats(1000)
+
+    def run():
+        printi = Printi()
+        for num in nums:
+            printi.find_representation(num)
+
+    return run, len(nums)
+
+
+@benchmark
+def bench_find_representation_constants():
+    # Cold, with the constant packs on. Their tables are built by the warm-up run
+    nums = random_floats(1000)
+
+    def run():
+        printi = Printi()
+        printi.update_config(constants=['math', 'physics'])
+        for num in nums:
+            printi.find_representation(num)
+
+    return run, len(nums)
+
+
+@benchmark
+def bench_find_representation_warm():
+    nums = random_floats(1000)
+    printi = Printi()
+    for num in nums:
+        printi.find_representation(num)
+
+    def run():
+        for num in nums:
+            printi.find_representation(num)
+
+    return run, len(nums)
+
+
+@benchmark
+def bench_find_representation_hits():
+    def run():
+        printi = Printi()
+        for num in KNOWN_HITS:
+            printi.find_representation(num)
+
+    return run, len(KNOWN_HITS)
+
+
+@benchmark
+def bench_rank_representations():
+    nums = random_floats(200) + KNOWN_HITS
+
+    def run():
+        printi = Printi()
+        for num in nums:
+            printi.rank_representations(num, 3)
+
+    return run, len(nums)
+
+
+@benchmark
+def bench_find_representations_log_lines():
+    lines = log_lines(500)
+
+    def run():
+        printi = Printi()
+        for line in lines:
+            printi.find_representations(line)
+
+    return run, len(lines)
+
+
+@benchmark
+def bench_format_equation():
+    printi = Printi()
+    cases = [
+        dict(const=math.pi, mult=2, div=3),
+        dict(const=math.pi, add=1, mult=-1, div=3, power=-2),
+        dict(const=5, mult=2, div=3, power=-2),
+        dict(const=math.e, add=-12, mult=83, div=17, power=2, flip_sign=True),
+    ]
+
+    def run():
+        for case in cases:
+            printi.format_equation(**case)
+
+    return run, len(cases)
+
+
+def _write_benchmark(lines: list[str], watch: bool, **config):
+    def run():
+        printi = Printi()
+        printi.update_config(**config)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            if watch:
+                printi.watch()
+            for line in lines:
+                print(line, end='')
+            if watch:
+                printi.unwatch()
+        finally:
+            sys.stdout = stdout
+
+    # print() does a write for the text and one for end
+    return run, len(lines) * 2
+
+
+@benchmark
+def bench_write_unwatched():
+    return _write_benchmark(log_lines(2000), watch=False)
+
+
+@benchmark
+def bench_write_watched():
+    return _write_benchmark(log_lines(2000), watch=True)
+
+
+@benchmark
+def bench_write_watched_sampled():
+    return _write_benchmark(log_lines(2000), watch=True, sample_repeats=10)
+
+
+@benchmark
+def bench_write_watched_no_numbers():
+    return _write_benchmark(['Nothing to see here, just some text\n'] * 2000, watch=True)
+
+
+def _startup_benchmark(code: str):
+    # Runs code in a fresh interpreter, since only the first import costs anything.
+    # This includes starting Python (~10-20ms), which doesn't change between runs.
+    env = {**os.environ, 'PYTHONPATH': str(SRC)}
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # Time it with cached bytecode, like an installed package
+
+    def run():
+        subprocess.run([sys.executable, '-c', code], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    return run, 1
+
+
+@benchmark
+def bench_startup_import():
+    return _startup_benchmark('import printi')
+
+
+@benchmark
+def bench_startup_watch():
+    # What a PYTHONSTARTUP file with printi.watch() costs, when nothing has a number in it
+    return _startup_benchmark('import printi; printi.watch(); print("Hello"); printi.unwatch()')
+
+
+def measure(func, repeat: int) -> dict:
+    run, ops = func()
+    run()  # Warm up, e.g. imports and building the candidate index
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        run()
+        times.append(time.perf_counter_ns() - start)
+
+    run, ops = func()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'ns_per_op': best / ops,
+        'ops_per_sec': ops / best * 1e9,
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Benchmark printi')
+    parser.add_argument('-k', dest='keyword', default='', help='Only run benchmarks with this in the name')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark, the fastest is used')
+    parser.add_argument('--save', metavar='PATH', help='Store the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Compare with results stored with --save')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='With --compare, a slowdown bigger than this fraction is a regression')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))['results']
+
+    results = {}
+    regressions = []
+    print(f'{"benchmark":<36} {"ns/op":>12} {"ops/sec":>12} {"peak KiB":>10} {"change":>8}')
+    for name, func in BENCHMARKS.items():
+        if args.keyword not in name:
+            continue
+
+        result = results[name] = measure(func, args.repeat)
+
+        change = ''
+        if name in baseline:
+            ratio = result['ns_per_op'] / baseline[name]['ns_per_op'] - 1
+            change = f'{ratio:+.0%}'
+            if ratio > args.threshold:
+                regressions.append(name)
+
+        print(f'{name:<36} {result["ns_per_op"]:>12,.0f} {result["ops_per_sec"]:>12,.0f} '
+              f'{result["peak_memory_kb"]:>10,.0f} {change:>8}')
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, indent=2), encoding='utf-8')
+
+    if regressions:
+        print(f'Slower than the baseline: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,26 @@ from .printi import Printi
 printi = Printi()
 watch = printi.watch
 unwatch = printi.unwatch
+wrap = printi.wrap
 update_config = printi.update_config
+batch = printi.batch
+flush = printi.flush
+find_representation = printi.find_representation
+rank_representations = printi.rank_representations
+find_representations_batch = printi.find_representations_batch
+find_representations_parallel = printi.find_representations_parallel
+annotate_frame = printi.annotate_frame
+stats = printi.stats
+reset_stats = printi.reset_stats
+
+
+def __getattr__(name):
+    # Imported when it's first used, so it doesn't slow down `import printi`
+    if name == 'RelationSearch':
+        from .relation import RelationSearch
+        return RelationSearch
+    if name == 'register_pack':
+        from .constants import register_pack
+        return register_pack
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,44 @@
+import queue
+import threading
+
+
+class AnnotationWorker:
+    # Runs the search for watched writes off the writing thread, so that a write
+    # to stdout returns as soon as the text is out. The 💡 lines follow later.
+    def __init__(self, printi):
+        self._printi = printi
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='printi', daemon=True)
+        self._thread.start()
+
+    def submit(self, value: str, stream=None):
+        # Always to the worker thread, even from inside an event loop, so the
+        # search never blocks the loop and join()/stop() can wait for it
+        self._queue.put((value, stream))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            value, stream = item
+            # The line was written (with its '\n') when it was submitted
+            self._printi.print_reps(value, stream, after_line=True)
+
+            # In batch mode, write everything so far once the writer has gone quiet
+            sink = self._printi._sink
+            if sink is not None and not sink.holding and self._queue.empty():
+                sink.flush()
+
+            self._queue.task_done()
+
+    def join(self):
+        # Waits for everything already submitted to be searched
+        self._queue.join()
+
+    def stop(self):
+        # Waits for everything already submitted to be written
+        self._queue.put(None)
+        self._thread.join()
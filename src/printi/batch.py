@@ -0,0 +1,71 @@
+import atexit
+import threading
+
+
+class BatchSink:
+    # Collects results from many writes and writes them out in one go: at the end
+    # of the line once there are `batch_size` of them, `batch_interval` seconds
+    # after the first one arrived (or at the end of the line after that, if a line
+    # is part written then), when flush() is called (e.g. by unwatch()) or at exit.
+    # Duplicates are dropped, so a value printed in a loop is only shown once.
+    def __init__(self, printi):
+        self._printi = printi
+        self._pending = {}  # Used as an ordered set
+        self._lock = threading.RLock()
+        self._timer = None
+        self.holding = 0  # While > 0, only an explicit flush() writes anything
+        self.due = False
+        atexit.register(self.flush)
+
+    def add(self, results: list[str]):
+        conf = self._printi._conf
+        with self._lock:
+            self._pending.update(dict.fromkeys(results))
+
+            if self.holding or not self._pending:
+                return
+
+            if len(self._pending) >= conf.batch_size:
+                # We're probably part way through a line, so wait for the end of it
+                self.due = True
+            elif self._timer is None and conf.batch_interval is not None:
+                self._timer = threading.Timer(conf.batch_interval, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def hold(self):
+        with self._lock:
+            self.holding += 1
+
+    def release(self):
+        with self._lock:
+            self.holding -= 1
+
+    def _on_timer(self):
+        with self._lock:
+            if self._printi._mid_line():
+                # Like batch_size, wait for the end of the line
+                self._timer = None
+                self.due = True
+                return
+
+            self.flush()
+
+    def flush_due(self):
+        if self.due and not self.holding:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self.due = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._pending:
+                self._printi._write('\n'.join(self._pending) + '\n')
+                self._pending = {}
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
@@ -0,0 +1,224 @@
+import functools
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+_MISSING = object()
+DROP = object()  # From a cache_carry_over() function, for a result that's no longer right
+
+
+class RepresentationCache:
+    # A bounded cache with a choice of eviction policy:
+    #  'lru': evict the least recently used entry
+    #  'lfu': evict the least frequently used entry (the oldest of those, on a tie)
+    #  'ttl': entries expire `ttl` seconds after they were added, and the oldest
+    #         is evicted when full
+    def __init__(self, maxsize: int | None = 1000, policy: str = 'lru', ttl: float | None = None):
+        self._lock = threading.Lock()
+        self.configure(maxsize, policy, ttl)
+
+    @staticmethod
+    def check(policy: str, ttl: float | None):
+        # Raises if a cache can't be set up this way
+        if policy not in ('lru', 'lfu', 'ttl'):
+            raise ValueError(f'{policy!r} is not a valid cache policy')
+
+        if policy == 'ttl' and ttl is None:
+            raise ValueError("The 'ttl' cache policy needs a cache_ttl")
+
+    def configure(self, maxsize: int | None, policy: str, ttl: float | None):
+        self.check(policy, ttl)
+
+        with self._lock:
+            self.maxsize = maxsize
+            self.policy = policy
+            self.ttl = ttl
+            self._clear()
+
+    def _clear(self):
+        self._data = OrderedDict()
+        self._counts = {}  # lfu: key -> count
+        self._buckets = defaultdict(OrderedDict)  # lfu: count -> keys, oldest first
+        self._expires = {}  # ttl: key -> expiry time
+        self.hits = self.misses = self.evictions = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._data))
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+
+            if value is not _MISSING and self.policy == 'ttl' and self._expires[key] <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                value = _MISSING
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            if self.policy == 'lru':
+                self._data.move_to_end(key)
+            elif self.policy == 'lfu':
+                self._bump(key)
+
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._data[key] = value
+                return
+
+            if self.maxsize is not None:
+                if self.maxsize <= 0:
+                    return
+                while len(self._data) >= self.maxsize:
+                    self._evict()
+
+            self._data[key] = value
+            if self.policy == 'lfu':
+                self._counts[key] = 1
+                self._buckets[1][key] = None
+            elif self.policy == 'ttl':
+                self._expires[key] = time.monotonic() + self.ttl
+
+    def rekey(self, func, is_current=lambda: True):
+        # Replaces every entry with func(key, value), which returns the new
+        # (key, value), or None to drop it. Entries keep their place in the
+        # eviction order, their use counts and their expiry times.
+        # func can be slow (it might search), so it's called without the lock,
+        # on a copy, and the results are swapped in after. Entries added meanwhile
+        # are kept, and win over a rekeyed one with the same key. Entries removed
+        # meanwhile stay removed, and if is_current() is False by then, nothing
+        # is swapped in.
+        with self._lock:
+            items = list(self._data.items())
+
+        rekeyed = {}
+        for key, value in items:
+            if (item := func(key, value)) is not None:
+                rekeyed[key] = item
+
+        with self._lock:
+            if not is_current():
+                return
+
+            data, counts, expires = self._data, self._counts, self._expires
+            self._data = OrderedDict()
+            self._counts = {}
+            self._buckets = defaultdict(OrderedDict)
+            self._expires = {}
+
+            processed = {key for key, _ in items}
+            for key, value in data.items():
+                if key in processed:
+                    if key not in rekeyed:
+                        continue  # Dropped
+                    new_key, value = rekeyed[key]
+                    if new_key in data and new_key not in processed:
+                        continue  # Already searched for again
+                else:
+                    new_key = key  # Added meanwhile
+
+                self._data[new_key] = value
+                if self.policy == 'lfu':
+                    self._counts[new_key] = counts[key]
+                    self._buckets[counts[key]][new_key] = None
+                elif self.policy == 'ttl':
+                    self._expires[new_key] = expires[key]
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data)
+
+    def _bump(self, key):
+        count = self._counts[key]
+        del self._buckets[count][key]
+        if not self._buckets[count]:
+            del self._buckets[count]
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+
+    def _remove(self, key):
+        del self._data[key]
+        if self.policy == 'lfu':
+            count = self._counts.pop(key)
+            del self._buckets[count][key]
+            if not self._buckets[count]:
+                del self._buckets[count]
+        elif self.policy == 'ttl':
+            del self._expires[key]
+
+    def _evict(self):
+        if self.policy == 'lfu':
+            key = next(iter(self._buckets[min(self._buckets)]))
+        else:
+            # For lru this is the least recently used, for ttl it's the oldest,
+            # which is also the first to expire
+            key = next(iter(self._data))
+
+        self._remove(key)
+        self.evictions += 1
+
+
+class cached_method:
+    # Like functools.lru_cache() for a method, but each Printi instance gets its
+    # own cache, sized by its config. Keys include the instance's config
+    # generation, so a result computed under an old config is never returned
+    # after an update, even if the search was still running when it happened.
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        conf = instance._conf
+        cache = RepresentationCache(conf.cache_size, conf.cache_policy, conf.cache_ttl)
+        func = self.func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = (instance._generation, *args)
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(instance, *args)
+                if key[0] == instance._generation:
+                    cache.set(key, result)
+
+            return result
+
+        def carry_over(update, generation: int):
+            # Moves the results from just before a config update to its generation.
+            # update(*args, result) returns the result to keep (the same one, or a
+            # changed one), or DROP if it has to be searched for again.
+            def rekey(key, result):
+                if key[0] != generation - 1:
+                    return None  # Left by a search that finished after an earlier update
+                result = update(*key[1:], result)
+                return None if result is DROP else ((generation, *key[1:]), result)
+
+            # If there's been another update by the time it's done, these are out of date
+            cache.rekey(rekey, lambda: instance._generation == generation)
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_carry_over = carry_over
+
+        # Store it on the instance so we only get here once
+        instance.__dict__[self.name] = wrapper
+        return wrapper
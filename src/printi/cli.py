@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .printi import Printi
+from .scan import find_numbers
+
+# Bytes that can be part of a number, so never a safe place to split a chunk
+_NUMBER_BYTES = frozenset(b'0123456789.-')
+
+_MAX_CHUNKS_PER_LINE = 16
+
+_worker_printi = None
+
+
+def read_chunks(file, chunk_size: int):
+    # Yields (offset, chunk) pieces of a binary file. Each piece ends at a line
+    # break, with the rest carried over to the next read. A line that goes on
+    # for many chunks is split anyway, but never in the middle of a number.
+    offset = 0
+    carry = b''
+    while data := file.read(chunk_size):
+        buffer = carry + data
+        split = buffer.rfind(b'\n') + 1
+        if not split and len(buffer) >= _MAX_CHUNKS_PER_LINE * chunk_size:
+            split = len(buffer)
+            while split and buffer[split - 1] in _NUMBER_BYTES:
+                split -= 1
+
+        if split:
+            yield offset, buffer[:split]
+            offset += split
+
+        carry = buffer[split:]
+
+    if carry:
+        yield offset, carry
+
+
+def annotate_chunk(printi: Printi, chunk: bytes, offset: int = 0) -> tuple[bytes, list[tuple[int, str, str]]]:
+    # Returns the chunk with a line for each result added after the line it's on,
+    # and the (offset, number, representation) of each result
+    symbol = printi._conf.symbol
+    output = []
+    records = []
+    pos = 0
+    line_end = 0
+    line_results = []
+
+    def end_line():
+        nonlocal pos
+        if line_results:
+            output.append(chunk[pos:line_end])
+            if not chunk[:line_end].endswith(b'\n'):
+                output.append(b'\n')
+            output.append(''.join(line_results).encode())
+            line_results.clear()
+            pos = line_end
+
+    view = memoryview(chunk)
+    for start, end in find_numbers(view):
+        if start >= line_end:
+            end_line()
+            line_end = chunk.find(b'\n', end) + 1 or len(chunk)
+
+        num_string = str(view[start:end], 'ascii')
+        if rep := printi.find_representation(float(num_string)):
+            records.append((offset + start, num_string, rep))
+            if (result := f'{symbol} {num_string} ≈ {rep}\n') not in line_results:
+                line_results.append(result)
+
+    end_line()
+    output.append(chunk[pos:])
+    return b''.join(output), records
+
+
+def _init_worker(config: dict):
+    global _worker_printi
+    _worker_printi = Printi()
+    _worker_printi.update_config(**config)
+
+
+def _annotate_in_worker(args):
+    offset, chunk = args
+    return annotate_chunk(_worker_printi, chunk, offset)
+
+
+def annotate_file(file, config: dict, chunk_size: int, jobs: int = 1):
+    # Yields annotate_chunk() results for each chunk of the file, in order.
+    # With more than one job, chunks are spread over a process pool, with a
+    # limited number in flight so huge files aren't read into memory at once.
+    chunks = read_chunks(file, chunk_size)
+
+    if jobs <= 1:
+        printi = Printi()
+        printi.update_config(**config)
+        for offset, chunk in chunks:
+            yield annotate_chunk(printi, chunk, offset)
+        return
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(config,)) as pool:
+        in_flight = deque()
+        for item in chunks:
+            in_flight.append(pool.submit(_annotate_in_worker, item))
+            if len(in_flight) >= jobs * 2:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog='printi',
+        description='Show alternate representations of the numbers in some text, '
+                    'e.g. -2.4674011002723395 ≈ -π²/4',
+    )
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help='Files to read, or - for stdin (the default)')
+    parser.add_argument('--report', metavar='PATH',
+                        help='Write a JSON line for each result to PATH. '
+                             'If PATH is -, this is written to stdout instead of the annotated text')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of processes to use (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=1 << 20,
+                        help='Bytes to read at a time (default: 1 MiB)')
+    parser.add_argument('--min-denominator', type=int)
+    parser.add_argument('--max-denominator', type=int)
+    parser.add_argument('--tol', type=float)
+    args = parser.parse_args(argv)
+
+    config = {
+        key: getattr(args, key)
+        for key in ('min_denominator', 'max_denominator', 'tol')
+        if getattr(args, key) is not None
+    }
+
+    try:
+        write_output(args, config)
+    except BrokenPipeError:
+        # The reader went away (e.g. `printi log.txt | head`), so stop quietly like
+        # other filters. Python flushes stdout on the way out, which would fail
+        # again, so it's pointed at devnull first.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+def write_output(args: argparse.Namespace, config: dict):
+    stdout = sys.stdout.buffer
+    report = None
+    if args.report == '-':
+        report = sys.stdout
+        stdout = None
+    elif args.report:
+        report = open(args.report, 'w', encoding='utf-8')
+
+    try:
+        for path in args.files:
+            file = sys.stdin.buffer if path == '-' else open(path, 'rb')
+            try:
+                for output, records in annotate_file(file, config, args.chunk_size, args.jobs):
+                    if stdout:
+                        stdout.write(output)
+                    if report:
+                        for offset, number, rep in records:
+                            report.write(json.dumps({
+                                'file': path,
+                                'offset': offset,
+                                'number': number,
+                                'representation': str(rep),
+                            }, ensure_ascii=False) + '\n')
+            finally:
+                if file is not sys.stdin.buffer:
+                    file.close()
+    finally:
+        if report and report is not sys.stdout:
+            report.close()
+        if stdout:
+            stdout.flush()
@@ -0,0 +1,239 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from fractions import Fraction as F
+from pathlib import Path
+
+from .numeric import close_window
+from .printi import FRACS, POWERS
+from .representation import Representation
+
+# Packs of constants that can be turned on with the `constants` config option,
+# as {value: name}. More can be added with register_pack().
+PACKS = {
+    'math': {
+        (1 + math.sqrt(5)) / 2: 'φ',
+        0.5772156649015329: 'γ',  # Euler–Mascheroni
+        1.2020569031595942: 'ζ(3)',  # Apéry
+        0.915965594177219: 'β(2)',  # Catalan's (not G, the gravitational constant)
+        2.6854520010653062: 'K',  # Khinchin
+        4.66920160910299: 'δ',  # Feigenbaum
+        1.324717957244746: 'ρ',  # Plastic ratio
+        math.log(2): 'ln(2)',
+        math.log(10): 'ln(10)',
+    },
+    'physics': {  # SI units, CODATA 2018, the same values as scipy.constants
+        6.62607015e-34: 'h',
+        6.62607015e-34 / math.tau: 'ħ',
+        1.602176634e-19: 'qₑ',
+        1.380649e-23: 'k_B',
+        6.02214076e23: 'N_A',
+        8.314462618: 'R',
+        0.0072973525693: 'α',
+        9.1093837015e-31: 'mₑ',
+        1.67262192369e-27: 'mₚ',
+        8.8541878128e-12: 'ε₀',
+        1.25663706212e-06: 'μ₀',
+        6.6743e-11: 'G',
+    },
+}
+
+# The forms of each constant in a table are the same as CandidateIndex uses for
+# specials, mult * constant ** power / div, plus any integer.
+# Bigger forms are only matched directly. Their fractional part is mostly
+# rounding error (and N_A has none), so 'an integer away' would match anything.
+MAX_OFFSET_FORM = 1e6
+
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')  # b'PRTC', VERSION, entries by value, entries by fractional part
+_registry_lock = threading.Lock()
+
+
+def register_pack(name: str, constants: dict[float, str]):
+    # Adds a pack of constants (or replaces one with the same name). Only this
+    # pack's table is built, the first time it's used.
+    for value, const_name in constants.items():
+        assert isinstance(value, float) and value > 0, 'Constants must be positive floats'
+        assert isinstance(const_name, str)
+
+    with _registry_lock:
+        PACKS[name] = dict(constants)
+
+
+def get_cache_dir() -> Path:
+    if path := os.environ.get('PRINTI_CACHE_DIR'):
+        return Path(path)
+    if sys.platform == 'win32' and 'LOCALAPPDATA' in os.environ:
+        return Path(os.environ['LOCALAPPDATA']) / 'printi'
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'printi'
+
+
+def _bits(value: float) -> int:
+    # Non-negative floats sort the same as their bit patterns do, as integers
+    return struct.unpack('<q', struct.pack('<d', value))[0]
+
+
+class ConstantTable:
+    # Every form of every constant in one pack, sorted by value, and again
+    # sorted by fractional part (to find integer offsets, e.g. 3 + γ/2).
+    # The table is built once and saved in the cache dir, named by a hash of
+    # the pack's contents. After that it's memory-mapped, so it costs nothing
+    # to load and the OS shares one copy between every process using it.
+    # Each entry is an id, from which the form is worked out again (see form()).
+    def __init__(self, constants: dict[float, str], cache_dir: Path | None = None):
+        self.constants = sorted(constants.items())
+        self.powers = [power if isinstance(power, int) else F(*power) for power in POWERS]
+        key = hashlib.sha256(repr((VERSION, sys.byteorder, self.constants, FRACS, POWERS)).encode()).hexdigest()
+        self.path = (cache_dir or get_cache_dir()) / f'constants-{key[:16]}.bin'
+
+        data = self._load()
+        _, _, n, n_frac = HEADER.unpack_from(data)
+        view = memoryview(data)[HEADER.size:]
+        self.value_bits = view[:8 * n].cast('q')
+        self.values = view[:8 * n].cast('d')
+        view = view[8 * n:]
+        self.frac_bits = view[:8 * n_frac].cast('q')
+        view = view[8 * n_frac:]
+        self.value_ids = view[:4 * n].cast('I')
+        self.frac_ids = view[4 * n:4 * (n + n_frac)].cast('I')
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._is_valid(data):
+                return data
+            data.close()
+        except (OSError, ValueError):  # E.g. not built yet, or (ValueError) an empty file
+            pass
+
+        data = self._build()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Written then renamed, so another process never sees half a table
+            temp_path = self.path.with_suffix(f'.{os.getpid()}.tmp')
+            temp_path.write_bytes(data)
+            os.replace(temp_path, self.path)
+        except OSError:
+            return data  # Nowhere to save it, so just use it from memory
+
+        with open(self.path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def _is_valid(data) -> bool:
+        # E.g. not a table from an older version, or one that was cut short
+        if len(data) < HEADER.size:
+            return False
+        magic, version, n, n_frac = HEADER.unpack_from(data)
+        return magic == b'PRTC' and version == VERSION and len(data) == HEADER.size + 12 * (n + n_frac)
+
+    def _build(self) -> bytes:
+        entries = []
+        for form_id in range(len(self.constants) * len(FRACS) * len(POWERS)):
+            if (test := self.test(form_id)) is not None:
+                entries.append((test, form_id))
+
+        by_value = sorted(entries)
+        by_frac = sorted((test % 1, form_id) for test, form_id in entries if test < MAX_OFFSET_FORM)
+
+        # The float64s go first, so they're 8-byte aligned
+        return b''.join([
+            HEADER.pack(b'PRTC', VERSION, len(by_value), len(by_frac)),
+            array('d', [value for value, _ in by_value]).tobytes(),
+            array('d', [frac for frac, _ in by_frac]).tobytes(),
+            array('I', [form_id for _, form_id in by_value]).tobytes(),
+            array('I', [form_id for _, form_id in by_frac]).tobytes(),
+        ])
+
+    def form(self, form_id: int) -> tuple:
+        # (constant, name, mult, div, power) for an id
+        rest, power_i = divmod(form_id, len(POWERS))
+        const_i, frac_i = divmod(rest, len(FRACS))
+        constant, name = self.constants[const_i]
+        mult, div = FRACS[frac_i]
+        return constant, name, mult, div, self.powers[power_i]
+
+    def test(self, form_id: int) -> float | None:
+        # The value of a form, or None if it's one that isn't used
+        constant, _, mult, div, power = self.form(form_id)
+        if power < 1 and (root := constant ** power) == round(root):
+            return None  # E.g. √4, which is better written as 2
+        return (mult * constant ** power) / div
+
+    def _window(self, bits, lo: float, hi: float) -> range:
+        return range(bisect_left(bits, _bits(max(lo, 0.0))), bisect_right(bits, _bits(hi)))
+
+    def find(self, num: float, tol: float) -> list[Representation]:
+        # Every form close to num, or an integer away from it
+        results = []
+
+        target = abs(num)
+        for i in self._window(self.value_bits, *close_window(target, tol)):
+            if math.isclose(target, self.values[i], rel_tol=tol):
+                constant, name, mult, div, power = self.form(self.value_ids[i])
+                rep = Representation(constant, name, mult=mult, power=power, div=div, sign=-1 if num < 0 else 1)
+                rep.kind = 'constant'
+                results.append(rep)
+
+        # num = add + test means they have the same fractional part, and
+        # num = add - test means they add up to a whole number
+        margin = 1e-12 * (1 + abs(num))
+        for frac, kind in ((num % 1, 'add'), (-num % 1, 'sub')):
+            indices = [*self._window(self.frac_bits, frac - margin, frac + margin)]
+            if frac - margin < 0:
+                indices += self._window(self.frac_bits, 1 + frac - margin, 1.0)
+            if frac + margin > 1:
+                indices += self._window(self.frac_bits, 0.0, frac + margin - 1)
+
+            for i in indices:
+                form_id = self.frac_ids[i]
+                test = self.test(form_id)
+                offset = num - test if kind == 'add' else num + test
+                if offset and offset.is_integer():
+                    constant, name, mult, div, power = self.form(form_id)
+                    rep = Representation(
+                        constant, name, add=int(offset), mult=mult if kind == 'add' else -mult, power=power, div=div,
+                    )
+                    rep.kind = 'constant'
+                    results.append(rep)
+
+        return results
+
+
+class ConstantLibrary:
+    # The packs named in the `constants` config option. Each pack has its own
+    # table, so adding a pack doesn't rebuild the others.
+    _tables = {}  # Shared by every library in the process, {(pack name, contents): ConstantTable}
+    _tables_lock = threading.Lock()
+
+    def __init__(self, names: list[str], cache_dir: Path | None = None):
+        self.names = names
+        self.tables = []
+        for name in names:
+            if name not in PACKS:
+                raise KeyError(f'There is no constant pack called {name!r}, add it with register_pack()')
+
+            key = name, tuple(sorted(PACKS[name].items()))
+            with self._tables_lock:
+                if key not in self._tables:
+                    self._tables[key] = ConstantTable(PACKS[name], cache_dir)
+                self.tables.append(self._tables[key])
+
+    def find_all(self, num: float, tol: float) -> list[Representation]:
+        results = []
+        for table in self.tables:
+            for rep in table.find(num, tol):
+                rep.error = abs(num - rep.value)
+                results.append(rep)
+        return results
+
+    def find(self, num: float, tol: float) -> Representation | None:
+        # The simplest match, then the closest
+        return min(self.find_all(num, tol), key=lambda rep: (rep.complexity, rep.error), default=None)
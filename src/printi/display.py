@@ -0,0 +1,209 @@
+import math
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+
+from .scan import find_numbers
+
+MAX_VALUES = 10_000  # Only this many numbers are searched from any one object
+MAX_DEPTH = 10  # How far into nested containers to look
+CACHE_SIZE = 32  # Objects to remember the results for
+
+
+def is_numpy(obj) -> bool:
+    # Without importing NumPy, since if it isn't loaded, nothing is a NumPy object
+    return type(obj).__module__ == 'numpy' and hasattr(obj, 'dtype')
+
+
+def is_interesting(num: float) -> bool:
+    # The same numbers a WatchedStream would search in the value's text, so not
+    # NaN or inf, and only with 4 or more decimal places (not 0.5)
+    return math.isfinite(num) and bool(find_numbers(repr(num)))
+
+
+def find_parts(obj, parts: list, budget: int = MAX_VALUES, depth: int = 0) -> int:
+    # Adds the floats in obj to `parts`, as floats or as flat NumPy arrays.
+    # The real and imaginary parts of complex numbers are searched separately.
+    # Returns how many more values can be added.
+    if budget <= 0 or isinstance(obj, bool | int | str | bytes):
+        return budget
+
+    if isinstance(obj, float):
+        parts.append(float(obj))  # np.float64 is a float, but has a different repr
+        return budget - 1
+
+    if isinstance(obj, complex):
+        parts.extend((obj.real, obj.imag))
+        return budget - 2
+
+    if is_numpy(obj):
+        # Arrays, and scalars like np.float32 that aren't a subclass of float
+        if obj.dtype.kind == 'f':
+            values = obj.ravel()[:budget]
+            parts.append(values)
+        elif obj.dtype.kind == 'c':
+            values = obj.ravel()[:budget // 2]
+            parts.extend((values.real, values.imag))
+        else:
+            return budget
+        return budget - len(values) * (1 + (obj.dtype.kind == 'c'))
+
+    if depth >= MAX_DEPTH:
+        return budget
+
+    if isinstance(obj, dict):
+        items = obj.values()
+    elif isinstance(obj, list | tuple | set | frozenset):
+        items = obj
+    else:
+        return budget
+
+    for item in items:
+        budget = find_parts(item, parts, budget, depth + 1)
+        if budget <= 0:
+            break
+
+    return budget
+
+
+def get_fingerprint(obj, depth: int = 0):
+    # Something that's equal for two objects only if they have the same values,
+    # so a mutable object (a list or array) that's displayed again is only
+    # searched again if it's been changed. None if the object can't be cached.
+    # Arrays are checksummed rather than copied.
+    if is_numpy(obj):
+        data = obj.data if obj.flags.c_contiguous else obj.tobytes()
+        return 'numpy', obj.shape, obj.dtype.str, zlib.crc32(data)
+
+    if depth >= MAX_DEPTH:
+        return None
+
+    if isinstance(obj, dict):
+        items = obj.items()
+    elif isinstance(obj, list | tuple):
+        items = obj
+    else:
+        return None
+
+    fingerprint = [type(obj)]
+    for item in items:
+        if isinstance(item, bool | int | float | complex | str | bytes | None):
+            fingerprint.append(item)
+        elif (item_fingerprint := get_fingerprint(item, depth + 1)) is not None:
+            fingerprint.append(item_fingerprint)
+        else:
+            return None
+
+    return tuple(fingerprint)
+
+
+class DisplayHook:
+    # Searches the value of each expression entered at the REPL (what
+    # sys.displayhook shows) from the object itself rather than from its text,
+    # so e.g. all the numbers in an array are seen at full precision, not just
+    # the ones NumPy prints, rounded.
+    # In IPython/Jupyter, where sys.displayhook is replaced for each cell, the
+    # value is taken from the 'post_run_cell' event instead.
+    # While the value is being displayed, its text isn't searched by any
+    # WatchedStream (see `displaying`).
+    def __init__(self, printi):
+        self._printi = printi
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # id(obj) -> (generation, fingerprint, results)
+        self._previous = None
+        self._shell = None
+
+    @property
+    def displaying(self) -> bool:
+        return getattr(self._local, 'displaying', False)
+
+    def install(self):
+        ipython = sys.modules.get('IPython')
+        self._shell = ipython.get_ipython() if ipython else None
+
+        if self._shell is None:
+            self._previous = sys.displayhook
+            sys.displayhook = self
+            return
+
+        self._shell.events.register('post_run_cell', self._post_run_cell)
+
+        hook = self._shell.displayhook
+        write_format_data = hook.write_format_data
+
+        def write_without_searching(*args, **kwargs):
+            self._local.displaying = True
+            try:
+                return write_format_data(*args, **kwargs)
+            finally:
+                self._local.displaying = False
+
+        hook.write_format_data = write_without_searching
+
+    def uninstall(self):
+        if self._shell is None:
+            if sys.displayhook is self:
+                sys.displayhook = self._previous
+            return
+
+        self._shell.events.unregister('post_run_cell', self._post_run_cell)
+        del self._shell.displayhook.write_format_data  # Back to the class's method
+
+    def __call__(self, value):
+        self._local.displaying = True
+        try:
+            self._previous(value)
+        finally:
+            self._local.displaying = False
+
+        if value is not None:
+            self.show(value)
+
+    def _post_run_cell(self, result):
+        if result.result is not None:
+            self.show(result.result)
+
+    def show(self, value):
+        self._printi.write_results(self.find_results(value), after_line=True)
+
+    def find_results(self, value) -> list[str]:
+        generation = self._printi._generation
+        fingerprint = get_fingerprint(value)
+        if fingerprint is not None:
+            with self._lock:
+                cached = self._cache.get(id(value))
+                if cached is not None and cached[:2] == (generation, fingerprint):
+                    self._cache.move_to_end(id(value))
+                    return cached[2]
+
+        results = {}  # Used as an ordered set
+        symbol = self._printi._conf.symbol
+        parts = []
+        find_parts(value, parts)
+        for part in parts:
+            if isinstance(part, float):
+                if is_interesting(part) and (rep := self._printi.find_representation(part)):
+                    results[f'{symbol} {part!r} ≈ {rep}'] = None
+                continue
+
+            # An array, where each distinct value is searched once, in the order they come
+            import numpy as np
+
+            nums, first = np.unique(part, return_index=True)
+            nums = [num for num in nums[np.argsort(first)].tolist() if is_interesting(num)]
+            if not nums:
+                continue
+            for num, rep in zip(nums, self._printi.find_representations_batch(nums)):
+                if rep:
+                    results[f'{symbol} {num!r} ≈ {rep}'] = None
+
+        results = list(results)
+        if fingerprint is not None:
+            with self._lock:
+                self._cache[id(value)] = (generation, fingerprint, results)
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        return results
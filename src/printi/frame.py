@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def is_arrow(table) -> bool:
+    return type(table).__module__.startswith('pyarrow')
+
+
+def get_columns(table, columns=None) -> dict[str, list[np.ndarray]]:
+    # The values of each column as float arrays, without copying them where
+    # possible: a float64 pandas column is a view of the frame's own data, and
+    # each chunk of an Arrow column without nulls is a view of its buffer.
+    # By default, only the float columns are used.
+    if is_arrow(table):
+        import pyarrow as pa
+
+        if columns is None:
+            columns = [field.name for field in table.schema if pa.types.is_floating(field.type)]
+
+        result = {}
+        for name in columns:
+            chunks = table.column(name).chunks
+            result[name] = [
+                chunk.to_numpy(zero_copy_only=True) if chunk.null_count == 0 and pa.types.is_float64(chunk.type)
+                else chunk.to_numpy(zero_copy_only=False).astype(float)  # Nulls become NaN
+                for chunk in chunks
+            ]
+        return result
+
+    if columns is None:
+        columns = [name for name, dtype in table.dtypes.items() if dtype.kind == 'f']
+
+    result = {}
+    for name in columns:
+        series = table[name]
+        if series.dtype == np.float64:
+            result[name] = [series.to_numpy(copy=False)]
+        else:  # e.g. float32, or the nullable Float64
+            result[name] = [series.to_numpy(dtype=float, na_value=np.nan)]
+    return result
+
+
+def annotate_frame(printi, table, columns=None, style: bool = False):
+    # See Printi.annotate_frame()
+    arrays = get_columns(table, columns)
+
+    # Each distinct value, across every column, is searched once
+    uniques = {
+        name: [np.unique(chunk, return_inverse=True) for chunk in chunks]
+        for name, chunks in arrays.items()
+    }
+    all_values = [values for chunks in uniques.values() for values, _ in chunks]
+    nums = np.unique(np.concatenate(all_values)) if all_values else np.empty(0)
+    reps = printi.find_representations_batch(nums)
+
+    def column_reps(name) -> np.ndarray:
+        parts = [reps[np.searchsorted(nums, values)][inverse] for values, inverse in uniques[name]]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=object)
+
+    if is_arrow(table):
+        if style:
+            raise ValueError('style=True is only available for pandas DataFrames')
+
+        import pyarrow as pa
+
+        # Arrow can't hold Python objects, so these are the rendered text
+        return pa.table({
+            name: pa.array([None if rep is None else str(rep) for rep in column_reps(name)], type=pa.string())
+            for name in arrays
+        })
+
+    if style:
+        found = {float(num): rep for num, rep in zip(nums, reps) if rep is not None}
+
+        def format_value(value):
+            rep = found.get(value)
+            return f'{value} ≈ {rep}' if rep is not None else str(value)
+
+        return table.style.format({name: format_value for name in arrays})
+
+    import pandas as pd
+
+    return pd.DataFrame({name: column_reps(name) for name in arrays}, index=table.index)
@@ -0,0 +1,52 @@
+import math
+
+
+def close_window(target: float, tol: float) -> tuple[float, float]:
+    # The (lo, hi) range to bisect for values math.isclose() to a positive
+    # target. Slightly wider than the math.isclose() window, so every hit still
+    # needs checking with it.
+    margin = target * 1e-12
+    lo = target * (1 - tol) - margin
+    hi = target / (1 - tol) + margin if tol < 1 else math.inf
+    return lo, hi
+
+
+def limit_denominator(
+        num: float,
+        max_denominator: int = 1000000,
+        cutoff: int | None = None,
+) -> tuple[int, int] | None:
+    # The same as Fraction(num).limit_denominator(max_denominator), returned as
+    # (numerator, denominator), but with plain integers from the float's exact
+    # ratio, without creating any Fraction objects.
+    # If `cutoff` is given, this returns None as soon as it's certain the
+    # denominator would be bigger than that. The denominators of the convergents
+    # only go up, and the result's is at least the last one's, so once one is
+    # over the cutoff there's no need to keep going.
+    n, d = num.as_integer_ratio()
+    if d <= max_denominator:
+        return None if cutoff is not None and d > cutoff else (n, d)
+
+    num_n, num_d = n, d
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    while True:
+        a = n // d
+        q2 = q0 + a * q1
+        if q2 > max_denominator:
+            break
+        if cutoff is not None and q2 > cutoff:
+            return None
+        p0, q0, p1, q1 = p1, q1, p0 + a * p1, q2
+        n, d = d, n - a * d
+
+    # Pick whichever of the best lower and upper approximations is closer,
+    # or p1/q1 in a tie. |p/q - num| is |p * num_d - num_n * q| / (q * num_d)
+    k = (max_denominator - q0) // q1
+    p2 = p0 + k * p1
+    q2 = q0 + k * q1
+    if abs(p1 * num_d - num_n * q1) * q2 <= abs(p2 * num_d - num_n * q2) * q1:
+        n, d = p1, q1
+    else:
+        n, d = p2, q2
+
+    return None if cutoff is not None and d > cutoff else (n, d)
@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_printi = None
+
+
+def _init_worker(conf):
+    from .printi import Printi
+
+    global _worker_printi
+    _worker_printi = Printi()
+    _worker_printi._conf = conf
+
+
+def _search_chunk(nums: list[float]) -> list:
+    return [_worker_printi.find_representation(num) for num in nums]
+
+
+def search_parallel(conf, nums: list[float], max_workers: int | None = None, min_chunk: int = 64) -> list:
+    # Runs find_representation() for each number, spread over a process pool.
+    # Each number's result doesn't depend on any other, and results come back
+    # in the order they went in, so this gives exactly the serial results.
+    if not nums:
+        return []
+
+    max_workers = max_workers or os.cpu_count() or 1
+    n_chunks = max(1, min(max_workers * 4, len(nums) // min_chunk))
+    chunk_size = -(-len(nums) // n_chunks)
+    chunks = [nums[i:i + chunk_size] for i in range(0, len(nums), chunk_size)]
+
+    if len(chunks) <= 1 or max_workers == 1:
+        _init_worker(conf)
+        return [rep for chunk in chunks for rep in _search_chunk(chunk)]
+
+    with ProcessPoolExecutor(min(max_workers, len(chunks)), initializer=_init_worker, initargs=(conf,)) as pool:
+        return [rep for reps in pool.map(_search_chunk, chunks) for rep in reps]
@@ -1,19 +1,214 @@
-import functools
+import contextlib
 import math
-import re
+import os
 import sys
-from dataclasses import dataclass
-from fractions import Fraction as F
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
 from itertools import product
+from time import perf_counter_ns, thread_time_ns
 
+from .background import AnnotationWorker
+from .batch import BatchSink
+from .cache import DROP, RepresentationCache, cached_method
+from .numeric import close_window, limit_denominator
+from .representation import Representation, complexity
+from .stats import Stats
+from .stream import WatchedStream
 
-@dataclass
-class Config:
-    min_denominator: int
-    max_denominator: int
-    tol: float  # Passed to math.isclose()
-    specials: dict[float, str]
-    symbol: str
+# People import printi in PYTHONSTARTUP, so this module only imports what
+# watching needs. Slow imports (fractions, json, re, sqlite3) are done where
+# they're used, the first time a line is searched.
+
+_MISSING = object()
+
+
+class Config(namedtuple('Config', [
+    'min_denominator',
+    'max_denominator',
+    'tol',  # Passed to math.isclose()
+    'specials',  # {value: name}
+    'symbol',
+    'log_location',  # 'line_below', 'line_end' or 'batch'
+    'batch_size',  # In batch mode, write once this many results are waiting
+    'batch_interval',  # Or once the first has waited this many seconds (or None)
+    'cache_size',  # Per cached method, None for no limit
+    'cache_policy',  # 'lru', 'lfu' or 'ttl'
+    'cache_ttl',  # Seconds, for the 'ttl' policy
+    'cache_path',  # An SQLite file to keep results in between sessions (or None)
+    'instrument',  # Collect the counters and timings returned by Printi.stats()
+    'match',  # 'first' (the first match found) or 'best' (the simplest, see rank_representations())
+    'backends',  # Searches to try when nothing else matches, e.g. [RelationSearch()]
+    'constants',  # Names of constant packs to search when the specials don't match, e.g. ['math']
+    'cpu_budget',  # When watching, the most CPU seconds to spend searching each second (or None)
+    'max_line_rate',  # Stop searching while more lines than this are written per second (or None)
+    'sample_repeats',  # Lines per second to search that only differ by their numbers (or None)
+])):
+    # Never changed once made, update_config() swaps in a new one. So anything
+    # that reads self._conf once sees a consistent set of options, even if
+    # another thread is updating them.
+    # A named tuple rather than a dataclass, because importing dataclasses is slow
+    __slots__ = ()
+
+
+# Options that change how results are shown, or which lines are searched, but
+# not what a search finds. Changing these keeps the cached results.
+# (cache_path and instrument aren't here, so that every search after they're
+# turned on goes through the store, or is counted.)
+DISPLAY_OPTIONS = frozenset({
+    'symbol',
+    'log_location',
+    'batch_size',
+    'batch_interval',
+    'cpu_budget',
+    'max_line_rate',
+    'sample_repeats',
+})
+# The kinds of match that come from a CandidateIndex
+INDEX_KINDS = ('direct', 'add', 'sub', 'mult')
+
+FRACS = [
+    (1, 1),
+    (1, 2),
+    (1, 3), (2, 3),
+    (1, 4), (3, 4),
+    (1, 5), (2, 5), (3, 5), (4, 5),
+    (1, 6), (5, 6),
+    (1, 7), (2, 7), (3, 7), (4, 7), (5, 7), (6, 7),
+    (1, 8), (3, 8), (5, 8), (7, 8),
+    (1, 9), (2, 9), (4, 9), (5, 9), (7, 9), (8, 9),
+]
+# Fractions are (numerator, denominator), and become a Fraction when the index is built
+POWERS = [
+    1, 2, 3, 4,
+    (1, 2), (1, 3),
+    (-1, 2), (-1, 3),
+]
+
+
+class CandidateIndex:
+    # Every `mult * constant ** power / divisor` value that find_representation
+    # tests, computed once per set of specials.
+    # `candidates` is in search order (the order product() would visit them),
+    # `tests`/`positions` are the same values sorted, so that a lookup can
+    # bisect into the tolerance window instead of scanning everything.
+    def __init__(self, candidates, offset_candidates, fraction_candidates, specials=None):
+        self.specials = specials  # What it was built from
+        self.candidates = candidates
+        self.offset_candidates = offset_candidates
+        self.fraction_candidates = fraction_candidates
+        self.offset_positions = [position for position, _ in offset_candidates]
+
+        self.positions = sorted(range(len(candidates)), key=lambda i: candidates[i][0])
+        self.tests = [candidates[i][0] for i in self.positions]
+
+        # For rank_representations(), the simplest a match built from each candidate
+        # can be, and the candidates in that order, so that it can stop once the
+        # rest can't beat what it's already found.
+        self.complexity = [
+            complexity(mult, divisor, power) for _, _, mult, divisor, power in candidates
+        ]
+        self.offset_by_complexity = sorted(
+            (self.complexity[position], position, test) for position, test in offset_candidates
+        )
+        self.fraction_by_complexity = sorted(
+            (complexity(power=power), -i, test, constant, power)
+            for i, (test, constant, power) in enumerate(fraction_candidates)
+        )
+
+    @classmethod
+    def build(cls, specials: dict[float, str], digits: bool = True) -> 'CandidateIndex':
+        candidates = []
+        offset_candidates = []
+        fraction_candidates = []
+        from fractions import Fraction as F
+
+        constants = list(specials.keys()) + (list(range(1, 10)) if digits else [])
+        powers = [power if isinstance(power, int) else F(*power) for power in POWERS]
+
+        for constant, (mult, divisor), power in product(constants, FRACS, powers):
+            # Don't raise 1 to anything
+            if constant == 1 and power != 1:
+                continue
+
+            # Avoid things like 2²
+            if constant not in specials and power > 1:
+                continue
+
+            #  To avoid things like √4, allow √3
+            if power < 1 and constant ** power % 1 == 0:
+                continue
+
+            test = (mult * constant ** power) / divisor
+            position = len(candidates)
+            candidates.append((test, constant, mult, divisor, power))
+
+            # For the special constants, we check some other patterns
+            if constant in specials or power < 1:
+                offset_candidates.append((position, test))
+
+            if mult == 1 and divisor == 1 and constant in specials:
+                fraction_candidates.append((test, constant, power))
+
+        return cls(candidates, offset_candidates, fraction_candidates, specials)
+
+    def find_all_close(self, target: float, tol: float) -> list[int]:
+        # Returns the search position of every candidate close to target
+        lo, hi = close_window(target, tol)
+        return [
+            self.positions[i]
+            for i in range(bisect_left(self.tests, lo), bisect_right(self.tests, hi))
+            if math.isclose(target, self.tests[i], rel_tol=tol)
+        ]
+
+    def find_close(self, target: float, tol: float) -> int | None:
+        # Returns the search position of the first candidate close to target
+        return min(self.find_all_close(target, tol), default=None)
+
+
+def _imaginary(text: str) -> str:
+    # E.g. πj, or (π/4)j, since π/4j would be π/(4j)
+    if ' ' in text or '/' in text:
+        return f'({text})j'
+    return f'{text}j'
+
+
+def _complex_text(string: str, members: list, found: list) -> str:
+    # E.g. 0.7071067811865476-0.7071067811865476j is 1/√2 - (1/√2)j
+    if len(members) == 1:
+        return _imaginary(str(found[0] or string[slice(*members[0])]))
+
+    real = str(found[0] or string[slice(*members[0])])
+    imag = string[slice(*members[1])]
+    if imag.startswith('-'):
+        imag = str(-found[1]) if found[1] else imag[1:]
+        return f'{real} - {_imaginary(imag)}'
+
+    return f'{real} + {_imaginary(str(found[1] or imag))}'
+
+
+def _vector_text(string: str, start: int, end: int, members: list, found: list) -> str:
+    # The vector with each number replaced by what was found for it,
+    # e.g. [0.78539816 1.57079633] is [π/4 π/2]
+    parts = []
+    last_end = start
+    spaced = ',' not in string[start:end]  # E.g. a NumPy array, where 1 + π/3 would be ambiguous
+    for (member_start, member_end), rep in zip(members, found):
+        parts.append(string[last_end:member_start])
+        text = str(rep) if rep else string[member_start:member_end]
+        if string[member_end:member_end + 1] == 'j':
+            if rep and member_start == last_end and string[member_start] == '-':
+                text = f'-{_imaginary(str(-rep))}'  # The sign joins the parts, e.g. π/3-(π/4)j
+            else:
+                text = _imaginary(text)
+            member_end += 1
+        elif spaced and ' ' in text:
+            text = f'({text})'
+        parts.append(text)
+        last_end = member_end
+    parts.append(string[last_end:end])
+
+    return ''.join(parts)
 
 
 class Printi:
@@ -29,8 +224,34 @@ class Printi:
                 math.e: 'e',
             },
             symbol='💡',
+            log_location='line_below',
+            batch_size=20,
+            batch_interval=1.0,
+            cache_size=1000,
+            cache_policy='lru',
+            cache_ttl=None,
+            cache_path=os.environ.get('PRINTI_CACHE_PATH'),
+            instrument=False,
+            match='first',
+            backends=[],
+            constants=[],
+            cpu_budget=None,
+            max_line_rate=None,
+            sample_repeats=None,
         )
-        self.original_write = None
+        self._lock = threading.RLock()  # For changes to the config and watched streams
+        self._streams = {}
+        self._index = None
+        self._other_index = None
+        self._constants = None
+        self._worker = None
+        self._sink = None
+        self._generation = 0
+        self._store = None
+        self._store_key = None
+        self._stats = Stats()
+        self._throttle = None  # Only made if one of its options is set
+        self._display_hook = None
 
     # TODO (@davidgilbertson): how to inherit the type annotations of print?
     #  Must I extend print, oh but that's not a class.
@@ -38,307 +259,937 @@ class Printi:
     #      "Note that the current implementation only supports function attributes
     #       on user-defined functions. Function attributes on built-in functions
     #       may be supported in the future."
-    def __call__(self, *args, **kwargs):
-        print(*args, **kwargs)
-        value = ' '.join(map(str, args))
-
-        # If we're watching, self.print_reps will have already been called.
-        if not self.original_write:
-            self.print_reps(value)
+    def __call__(self, *args, file=None, **kwargs):
+        # If we're watching, the text will be searched as it's written
+        if file is None and 'stdout' in self._streams:
+            print(*args, **kwargs)
+            return
+        if isinstance(file, WatchedStream) and file._printi is self:
+            print(*args, file=file, **kwargs)
+            return
 
-        # for rep in self.find_representations(value):
-        #     print(rep)
+        # Otherwise, watch just this one print
+        stream = self.wrap(sys.stdout if file is None else file)
+        print(*args, file=stream, **kwargs)
+        stream.finish()
 
     def format_equation(
             self,
             const: float,
             add: int = 0,
             mult: int = 1,
-            power: F | int = 1,
+            power: 'F | int' = 1,
             div: int = 1,
             flip_sign: bool = False,
     ) -> str:
+        return self._equation(self._conf, const, add, mult, power, div, flip_sign).render()
+
+    @staticmethod
+    def format_fraction(frac: 'F') -> str:
+        return Representation.fraction(frac).render()
+
+    def _equation(
+            self,
+            conf: Config,
+            const: float,
+            add: int = 0,
+            mult: int = 1,
+            power: 'F | int' = 1,
+            div: int = 1,
+            flip_sign: bool = False,
+    ) -> Representation:
         # The base form is: add + mult * const ** power / div
-        # The code below starts with const and appends/prepends the other parts
-        # to build the return string
+        # Nothing is turned into a string here, that happens when it's displayed
         assert div >= 1
 
-        result = const
-
-        const_on_top = power > 0
-        power = abs(power)
-
-        # TODO (@davidgilbertson): I don't love how this becomes a string so soon
-        #  Is there a smarter way to do this, where I fill in slots? E.g. in a ± bc/cd
-        if const in self._conf.specials:
-            result = self._conf.specials[const]
-
-        if power == F(1, 2):
-            result = f'√{result}'
-        elif power == F(1, 3):
-            result = f'∛{result}'
-        elif power == 2:
-            result = f'{result}²'
-        elif power == 3:
-            result = f'{result}³'
-        elif power == 4:
-            result = f'{result}⁴'
-        elif power != 1:
-            result = f'{result}^{power}'
-
-        sub_from = 0
-        if add != 0 and mult < 0:
-            sub_from = add
-            add = 0
-            mult *= -1
-
-        if const_on_top:
-            if mult != 1:
-                if isinstance(result, float):
-                    result *= mult
-                elif power > 1 and isinstance(const, int):
-                    result = f'{mult}×{result}'
+        return Representation(
+            const,
+            name=conf.specials.get(const),
+            add=add,
+            mult=mult,
+            power=power,
+            div=div,
+            sign=-1 if flip_sign else 1,
+        )
+
+    # TODO (@davidgilbertson): can I get autocomplete for these params
+    #  Based on the Config type?
+    def update_config(self, **new_config):
+        with self._lock:
+            old_conf = self._conf
+            changes = {}
+            for key, val in new_config.items():
+                if key == 'specials':
+                    assert isinstance(val, dict)
+                    specials = dict(self._conf.specials)
+                    for s_key, s_val in val.items():
+                        assert isinstance(s_key, float)
+                        assert isinstance(s_val, str | None)
+                        if s_val is None:
+                            del specials[s_key]
+                        else:
+                            specials[s_key] = s_val
+
+                    changes['specials'] = specials
+
+                    # The candidate values only depend on the specials, everything
+                    # else in the config is applied at lookup time.
+                    self._index = None
+                elif key == 'constants':
+                    from .constants import PACKS
+
+                    for name in val:
+                        if name not in PACKS:
+                            raise ValueError(f'There is no constant pack called {name!r}, add it with register_pack()')
+                    changes[key] = val
+                elif key in Config._fields:
+                    changes[key] = val
                 else:
-                    result = f'{mult}{result}'
-
-            if div != 1:
-                result = f'{result}/{div}'
-        else:  # const is on the bottom
-            if div != 1:
-                if isinstance(result, float):
-                    result *= div
-                elif power > 1 and isinstance(const, int):
-                    result = f'({div}×{result})'  # e.g. 3×5²
+                    print(f'{key!r} is not a valid config option')
+
+            new_conf = self._conf._replace(**changes)
+
+            # Before anything changes, so a bad update leaves the instance as it was
+            RepresentationCache.check(new_conf.cache_policy, new_conf.cache_ttl)
+
+            self._conf = new_conf
+            self._stats.enabled = self._conf.instrument
+
+            if self._conf.cpu_budget is None and self._conf.max_line_rate is None and self._conf.sample_repeats is None:
+                self._throttle = None
+            elif self._throttle is None:
+                from .throttle import Throttle
+
+                self._throttle = Throttle()
+
+            # Results from before now won't be returned, even by a search that's
+            # still running (e.g. in a background worker)
+            self._generation += 1
+
+            new_conf, generation = self._conf, self._generation
+            if {'cache_size', 'cache_policy', 'cache_ttl'} & new_config.keys():
+                for cached in (self.find_representation, self.rank_representations, self.find_representations):
+                    cached.cache.configure(new_conf.cache_size, new_conf.cache_policy, new_conf.cache_ttl)
+                return new_conf
+
+        # Outside the lock, since re-testing results can take a while. If there's
+        # another update meanwhile, what this keeps is dropped (see cache.rekey()).
+        self._carry_over(old_conf, new_conf, generation)
+        return new_conf
+
+    def _carry_over(self, old: Config, new: Config, generation: int):
+        # Keeps the cached results that are still right under the new config, so
+        # a small change doesn't mean searching for everything again:
+        #  - display options (e.g. symbol) keep everything, and the results of
+        #    find_representations() get the new symbol
+        #  - new specials only re-test what didn't match an existing special,
+        #    against just the new ones, and renamed specials are renamed
+        #  - removed specials drop the results that used them
+        #  - a narrower min/max_denominator drops the fractions outside it
+        # Anything else (or a mix of these) clears the caches.
+        changed = {field for field in Config._fields if getattr(old, field) != getattr(new, field)}
+        search_changes = changed - DISPLAY_OPTIONS
+
+        if search_changes:
+            self.rank_representations.cache_clear()
+            self.find_representations.cache_clear()
+        else:
+            self.rank_representations.cache_carry_over(lambda *args: args[-1], generation)  # k may be left out
+
+            # Each result starts with the symbol
+            cut = len(old.symbol)
+            self.find_representations.cache_carry_over(
+                lambda string, results: [f'{new.symbol}{result[cut:]}' for result in results], generation,
+            )
+
+        if not search_changes:
+            self.find_representation.cache_carry_over(lambda num, rep: rep, generation)
+        elif new.match != 'first':
+            # The best match could be anywhere, so everything is searched again
+            self.find_representation.cache_clear()
+        elif search_changes == {'specials'}:
+            self.find_representation.cache_carry_over(self._specials_update(old, new), generation)
+        elif (
+                search_changes <= {'min_denominator', 'max_denominator'}
+                and new.min_denominator >= old.min_denominator
+                and new.max_denominator <= old.max_denominator
+        ):
+            # Any other result was found because there was no fraction (or last
+            # resort) within the old limits, so there still isn't one
+            def update(num, rep):
+                if rep is not None and rep.kind in ('fraction', 'last_resort') and not (
+                        new.min_denominator <= rep.div <= new.max_denominator
+                ):
+                    return DROP
+                return rep
+
+            self.find_representation.cache_carry_over(update, generation)
+        else:
+            self.find_representation.cache_clear()
+
+    def _specials_update(self, old: Config, new: Config):
+        # For _carry_over(), when the specials have changed. New specials go on the
+        # end, so their candidates are tested after the existing specials' and
+        # before the digits'. So a match for an existing special still stands,
+        # a match for a digit is searched for again, and anything else (a constant,
+        # last resort, or no match) didn't match any candidate, so it only needs
+        # testing against the new specials' candidates.
+        removed = old.specials.keys() - new.specials.keys()
+        renamed = {value: name for value, name in new.specials.items() if old.specials.get(value, name) != name}
+        added = {value: name for value, name in new.specials.items() if value not in old.specials}
+        added_conf = None
+        if added:
+            # Backends are left out, since what they'd find depends on every special
+            added_conf = new._replace(specials=added, backends=[])
+            self._other_index = CandidateIndex.build(added, digits=False)
+
+        def rename(rep):
+            if rep.const not in renamed:
+                return rep
+            return Representation(
+                rep.const, renamed[rep.const], rep.add, rep.mult, rep.power, rep.div, rep.sign, rep.error, rep.kind,
+            )
+
+        def update(num, rep):
+            if rep is not None and rep.kind == 'fraction':
+                return rep
+
+            if isinstance(rep, Representation) and rep.const in removed:
+                return DROP
+
+            if isinstance(rep, Representation) and rep.kind in INDEX_KINDS and rep.const in old.specials:
+                return rename(rep)
+
+            if isinstance(rep, Representation) and rep.kind in INDEX_KINDS:
+                return DROP if added else rep  # A digit
+
+            if added_conf is not None and (found := self._search(num, added_conf)):
+                return found
+
+            if rep is None:
+                return DROP if new.backends else None
+
+            if isinstance(rep, Representation) and rep.kind in ('constant', 'last_resort'):
+                return rename(rep)
+
+            return DROP  # From a backend
+
+        return update
+
+    def _get_index(self, conf: Config) -> 'CandidateIndex':
+        # The index for the specials in conf, which might not be the latest
+        # ones if they've just been updated
+        index = self._index
+        if index is None or index.specials is not conf.specials:
+            # Also kept is the last index built for some other config, e.g. by a
+            # search that was running during an update, or by _carry_over()
+            index = self._other_index
+            if index is None or index.specials is not conf.specials:
+                index = CandidateIndex.build(conf.specials)
+                if conf is self._conf:
+                    self._index = index
                 else:
-                    result = f'{div}{result}'  # e.g. 3π
-
-            result = f'{mult}/{result}'
-
-        if add > 0:
-            sign = '-' if flip_sign else '+'
-            result = f'{add} {sign} {result}'
-        elif add < 0:
-            sign = '-' if flip_sign else ''
-            result = f'{sign}{result} - {abs(add)}'
-        elif sub_from != 0:
-            # subtracting a negative is addition, so the sign is flipped here
-            sign = '+' if flip_sign else '-'
-            result = f'{sub_from} {sign} {result}'
+                    self._other_index = index
+        return index
+
+    def _get_constants(self, conf: Config) -> 'ConstantLibrary':
+        # Like _get_index(), for the constant packs in conf
+        library = self._constants
+        if library is None or library.names != conf.constants:
+            from .constants import ConstantLibrary
+
+            library = ConstantLibrary(conf.constants)
+            if conf is self._conf:
+                self._constants = library
+        return library
+
+    def _find_constant(self, num: float, conf: Config) -> Representation | None:
+        # The simplest match from the constant packs, if any are turned on
+        if conf.constants:
+            return self._get_constants(conf).find(num, conf.tol)
+
+    def _find_fraction(self, num: float, conf: Config) -> Representation | None:
+        frac = limit_denominator(num, cutoff=conf.max_denominator)
+        if frac and conf.min_denominator <= frac[1]:
+            n, d = frac
+            return Representation(None, mult=n, div=d, error=abs(num - n / d), kind='fraction')
+
+    def _format_match(self, num: float, kind: str, position: int, conf: Config) -> Representation:
+        # Builds the result for the candidate at `position`, where `kind` is the
+        # pattern that matched: 'direct', 'add', 'sub' or 'mult'
+        test, constant, mult, divisor, power = self._get_index(conf).candidates[position]
+
+        if kind == 'direct':
+            rep = self._equation(
+                conf,
+                # add=0,
+                mult=mult,
+                const=constant,
+                power=power,
+                div=divisor,
+                flip_sign=num < 0
+            )
+        elif kind == 'add':
+            rep = self._equation(
+                conf,
+                add=int(num - test),
+                mult=mult,
+                const=constant,
+                power=power,
+                div=divisor,
+            )
+        elif kind == 'sub':
+            # TODO (@davidgilbertson): I should be able to use add_to and mult *= -1
+            rep = self._equation(
+                conf,
+                add=int(num + test),
+                mult=mult * -1,
+                const=constant,
+                power=power,
+                div=divisor,
+            )
         else:
-            sign = '-' if flip_sign else ''
-            result = f'{sign}{result}'
+            rep = self._equation(
+                conf,
+                # add=0,
+                mult=mult * int(num / test),
+                const=constant,
+                power=power,
+                div=divisor,
+            )
 
-        return result
+        rep.error = abs(num - rep.value)
+        rep.kind = kind
+        return rep
 
-    @staticmethod
-    def format_fraction(frac: F) -> str:
-        n = frac.numerator
-        d = frac.denominator
+    def _find_last_resort(self, num: float, conf: Config):
+        # In addition to looping over mult/divisor, we also check if there's some big
+        #  fraction we can mix in.
+        # This matches quite eagerly, but there could be cleaner results, so it's only
+        # used if nothing else matched. The last candidate in the old loop order
+        # would have won, so walk them backwards and stop at the first one.
+        # TODO (@davidgilbertson): it would be nice to combine big fractions with add/subtract
+        for test, constant, power in reversed(self._get_index(conf).fraction_candidates):
+            frac = limit_denominator(num / test, cutoff=conf.max_denominator)
 
-        if n > d:
-            return f'{n // d} + {n % d}/{d}'
+            if frac and frac[0] and conf.min_denominator <= frac[1]:
+                rep = self._equation(
+                    conf,
+                    # add=0,
+                    mult=frac[0],
+                    const=constant,
+                    power=power,
+                    div=frac[1],
+                )
+                rep.error = abs(num - rep.value)
+                rep.kind = 'last_resort'
+                return rep
 
-        return f'{n}/{d}'
+    def _get_store(self, conf: Config) -> tuple['DiskStore | None', str | None]:
+        # Opened on first use, so watch() and printi() only pay for it if they need it
+        # Returns the store, and the key for results found with this config
+        if conf.cache_path is None:
+            return None, None
 
-    # TODO (@davidgilbertson): can I get autocomplete for these params
-    #  Based on the Config type?
-    def update_config(self, **new_config):
-        for key, val in new_config.items():
-            if key == 'specials':
-                assert isinstance(val, dict)
-                for s_key, s_val in val.items():
-                    assert isinstance(s_key, float)
-                    assert isinstance(s_val, str | None)
-                    if s_val is None:
-                        del self._conf.specials[s_key]
-                    else:
-                        self._conf.specials[s_key] = s_val
-            elif hasattr(self._conf, key):
-                setattr(self._conf, key, val)
-            else:
-                print(f'{key!r} is not a valid config option')
+        from .store import DiskStore
+
+        with self._lock:
+            if self._store is None or self._store.path != conf.cache_path:
+                self._store = DiskStore(conf.cache_path)
 
-        # TODO (@davidgilbertson): write tests. Check cache clearing
-        self.find_representation.cache_clear()
-        self.find_representations.cache_clear()
-        return self._conf
+            store_conf, store_key = self._store_key or (None, None)
+            if store_conf is not conf:
+                # Only the options that change the result of a search
+                store_key = DiskStore.config_key(
+                    # Rows from when results were stored as text, or keyed on sorted specials, won't match
+                    'Representation/ordered-specials',
+                    conf.min_denominator,
+                    conf.max_denominator,
+                    conf.tol,
+                    list(conf.specials.items()),  # In order, since the first match depends on it
+                    conf.match,
+                    [repr(backend) for backend in conf.backends],
+                    conf.constants,
+                )
+                self._store_key = conf, store_key
+
+            return self._store, store_key
 
-    @functools.lru_cache(maxsize=1000)
+    @cached_method
     def find_representation(self, num: float):
-        last_resort = None
-
-        # TODO (@davidgilbertson): perhaps track all matches, then pick the best representation
-        #  e.g. prefer √2/2 over 1/√2
-        fracs = [
-            (1, 1),
-            (1, 2),
-            (1, 3), (2, 3),
-            (1, 4), (3, 4),
-            (1, 5), (2, 5), (3, 5), (4, 5),
-            (1, 6), (5, 6),
-            (1, 7), (2, 7), (3, 7), (4, 7), (5, 7), (6, 7),
-            (1, 8), (3, 8), (5, 8), (7, 8),
-            (1, 9), (2, 9), (4, 9), (5, 9), (7, 9), (8, 9),
-        ]
-        powers = [
-            1, 2, 3, 4,
-            F(1, 2), F(1, 3),
-            -F(1, 2), -F(1, 3),
-        ]
-        constants = list(self._conf.specials.keys()) + list(range(1, 10))
-        min_denominator = self._conf.min_denominator
-        max_denominator = self._conf.max_denominator
+        conf = self._conf
+        store, store_key = self._get_store(conf)
+        if store is None:
+            return self._search(num, conf)
+
+        import json
+
+        stored = store.get(store_key, num, _MISSING)
+        if stored is _MISSING:
+            rep = self._search(num, conf)
+            store.set(store_key, num, rep and json.dumps(rep.to_dict()))
+        else:
+            rep = stored and self._load(json.loads(stored))
+
+        return rep
+
+    @staticmethod
+    def _load(data: dict):
+        from .relation import Combination
+
+        return Combination.from_dict(data) if 'terms' in data else Representation.from_dict(data)
+
+    def _search_backends(self, num: float, conf: Config, stats: Stats | None):
+        # For when nothing else matched, the backends are tried in order
+        rep = None
+        if conf.backends:
+            if stats:
+                start = perf_counter_ns()
+
+            for backend in conf.backends:
+                if rep := backend(num, conf):
+                    break
+
+            if stats:
+                stats.record('backends', perf_counter_ns() - start)
+
+        if stats:
+            stats.count(f'match.{rep.kind}' if rep else 'match.none')
+
+        return rep
+
+    def _search(self, num: float, conf: Config):
+        stats = self._stats if self._stats.enabled else None
+        if stats:
+            start = perf_counter_ns()
 
         # Skip things like 0.99999999999999999 ≈ 1. Not helpful!
         # TODO (@davidgilbertson): is num %1 better than round()?
-        if math.isclose(round(num), num, rel_tol=self._conf.tol):
+        if math.isclose(round(num), num, rel_tol=conf.tol):
+            if stats:
+                stats.count('match.integer')
             return
 
+        if conf.match == 'best':
+            if ranked := self._rank(num, 1, conf):  # With this search's config, not the latest
+                if stats:
+                    stats.count(f'match.{ranked[0].kind}')
+                return ranked[0]
+
+            return self._search_backends(num, conf, stats)
+
         # First test for plain fractions
-        frac = F(num).limit_denominator()
-        if min_denominator <= frac.denominator <= max_denominator:
-            return self.format_fraction(frac)
+        if rep := self._find_fraction(num, conf):
+            if stats:
+                stats.count('match.fraction')
+            return rep
 
-        for constant, (mult, divisor), power in product(constants, fracs, powers):
-            # if constant == math.pi and mult == 1 and divisor == 1 and power == 1:
-            #     breakpoint()
+        index = self._get_index(conf)
 
-            # Don't raise 1 to anything
-            if constant == 1 and power != 1:
-                continue
+        # All test values are positive, so we compare with an absolute value,
+        # and flip the sign back later if required.
+        # The earliest direct match (in the old product() order) wins, but any
+        # candidate before it can still match by adding/subtracting/multiplying
+        # an integer, so we only need to scan up to that point.
+        first_match = index.find_close(abs(num), conf.tol)
+        stop = len(index.candidates) if first_match is None else first_match
+        match = None
 
-            # Avoid things like 2²
-            if constant not in self._conf.specials and power > 1:
-                continue
+        for position, test in index.offset_candidates:
+            if position >= stop:
+                break
 
-            #  To avoid things like √4, allow √3
-            if power < 1 and constant ** power % 1 == 0:
-                continue
+            # Can we adjust by an integer? Includes subtraction I.e. π + -x is π - x
+            # If we're off by a whole number, just add that number
+            if (num - test).is_integer():
+                match = 'add', position
+                break
 
-            test = (mult * constant ** power) / divisor
-            # All test values are positive, so we compare with an absolute value,
-            # and flip the sign back later if required
-            if math.isclose(abs(num), test, rel_tol=self._conf.tol):
-                return self.format_equation(
-                    # add=0,
-                    mult=mult,
-                    const=constant,
-                    power=power,
-                    div=divisor,
-                    flip_sign=num < 0
-                )
+            # Can we subtract from an integer? I.e. x - π
+            if (num + test).is_integer():
+                match = 'sub', position
+                break
 
-            # For the special constants, we check some other patterns
-            if constant in self._conf.specials or power < 1:
-                # Can we adjust by an integer? Includes subtraction I.e. π + -x is π - x
-                # If we're off by a whole number, just add that number
-                add_to = num - test
-                if round(add_to) == add_to:
-                    return self.format_equation(
-                        add=int(add_to),
-                        mult=mult,
-                        const=constant,
-                        power=power,
-                        div=divisor,
-                    )
+            # Can we multiply by an integer? E.g. 3π
+            if (num / test).is_integer():
+                match = 'mult', position
+                break
 
-                # Can we subtract from an integer? I.e. x - π
-                sub_from = num + test
-                if round(sub_from) == sub_from:
-                    # TODO (@davidgilbertson): I should be able to use add_to and mult *= -1
-                    return self.format_equation(
-                        add=int(sub_from),
-                        mult=mult * -1,
-                        const=constant,
-                        power=power,
-                        div=divisor,
-                    )
+        if match is None and first_match is not None:
+            match = 'direct', first_match
 
-                # Can we multiply by an integer? E.g. 3π
-                mult_by = num / test
-                if round(mult_by) == mult_by:
-                    return self.format_equation(
-                        # add=0,
-                        mult=mult * round(mult_by),
-                        const=constant,
-                        power=power,
-                        div=divisor,
-                    )
+        if stats:
+            searched = len(index.candidates) if match is None else match[1] + 1
+            stats.count('candidates', bisect_left(index.offset_positions, searched))
+            stats.record('search', perf_counter_ns() - start)
+            start = perf_counter_ns()
+
+        if match is None:
+            rep = self._find_constant(num, conf) or self._find_last_resort(num, conf)
+        else:
+            rep = self._format_match(num, *match, conf)
+
+        if stats:
+            if match is None:
+                # This is more searching than formatting
+                stats.record('last_resort', perf_counter_ns() - start)
+                if rep:
+                    stats.count(f'match.{rep.kind}')
+            else:
+                stats.record('format', perf_counter_ns() - start)
+                stats.count(f'match.{match[0]}')
+
+        if rep is None:
+            rep = self._search_backends(num, conf, stats)
+
+        return rep
+
+    @cached_method
+    def rank_representations(self, num: float, k: int = 5) -> list[Representation]:
+        # Every match for num (within `tol`, or exact for the integer patterns),
+        # simplest first, then closest, then in the order find_representation()
+        # would have found them. Returns at most k.
+        return self._rank(num, k, self._conf)
+
+    def _rank(self, num: float, k: int, conf: Config) -> list[Representation]:
+        # Candidates are visited in order of how simple they could be, so once
+        # there are k matches, it stops at the first candidate that can't beat them.
+        if math.isclose(round(num), num, rel_tol=conf.tol):
+            return []
+
+        index = self._get_index(conf)
+        found = {}
+
+        def consider(rep, order):
+            if rep is None:
+                return
+
+            if (divisor := math.gcd(rep.mult, rep.div)) != 1:
+                # E.g. 2√2/4 is √2/2
+                rep.mult //= divisor
+                rep.div //= divisor
+
+            if isinstance(rep.const, int) and rep.power == 1:
+                if abs(rep.mult) != 1 or math.gcd(rep.const, rep.div) != 1:
+                    return  # A plain fraction, written a worse way, e.g. 6/8
+
+                top = rep.add * rep.div + rep.sign * rep.mult * rep.const
+                if fraction is not None and top * fraction.div == fraction.mult * rep.div:
+                    return  # The fraction again, e.g. 7/3 when there's 2 + 1/3
+
+            if isinstance(rep.const, int) and not isinstance(rep.power, int) and any(
+                    rep.const % factor ** rep.power.denominator == 0 for factor in range(2, rep.const)
+            ):
+                return  # E.g. 1/√4, or √8, which is 2√2
+
+            score = rep.complexity, rep.error, order
+            if (text := str(rep)) not in found or score < found[text][0]:
+                found[text] = score, rep
+
+        def bound():
+            # Candidates simpler than this could still make the top k
+            if len(found) < k:
+                return math.inf
+            return sorted(score for score, _ in found.values())[k - 1][0]
+
+        fraction = self._find_fraction(num, conf)
+        consider(fraction, -1)
+
+        for position in index.find_all_close(abs(num), conf.tol):
+            consider(self._format_match(num, 'direct', position, conf), position)
+
+        limit = bound()
+        for cost, position, test in index.offset_by_complexity:
+            if cost > limit:
+                break
+
+            if (num - test).is_integer():
+                consider(self._format_match(num, 'add', position, conf), position)
+                limit = bound()
+            if (num + test).is_integer():
+                consider(self._format_match(num, 'sub', position, conf), position)
+                limit = bound()
+            if (num / test).is_integer():
+                consider(self._format_match(num, 'mult', position, conf), position)
+                limit = bound()
+
+        # Then anything from the constant packs, which find_representation()
+        # only tries once none of the above match
+        n_candidates = len(index.candidates)
+        if conf.constants:
+            for rep in self._get_constants(conf).find_all(num, conf.tol):
+                consider(rep, n_candidates)
+            limit = bound()
+
+        # Last resort matches are considered last, find_representation()
+        # would have preferred the last of these
+        for cost, order, test, constant, power in index.fraction_by_complexity:
+            if cost > limit:
+                break
 
-            # In addition to looping over mult/divisor, we also check if there's some big
-            #  fraction we can mix in.
-            # TODO (@davidgilbertson): it would be nice to combine big fractions with add/subtract
-            if mult == 1 and divisor == 1 and constant in self._conf.specials:
-                frac = F(num / test).limit_denominator()
-
-                if frac and min_denominator <= frac.denominator <= max_denominator:
-                    # This matches quite eagerly, but there could be cleaner results.
-                    # So we store this and if nothing else returns a value, we'll return this.
-                    last_resort = self.format_equation(
-                        # add=0,
-                        mult=mult * frac.numerator,
-                        const=constant,
-                        power=power,
-                        div=divisor * frac.denominator,
+            frac = limit_denominator(num / test, cutoff=conf.max_denominator)
+            if frac and frac[0] and conf.min_denominator <= frac[1]:
+                rep = self._equation(conf, constant, mult=frac[0], power=power, div=frac[1])
+                rep.error = abs(num - rep.value)
+                rep.kind = 'last_resort'
+                consider(rep, n_candidates + len(index.fraction_candidates) + order)
+                limit = bound()
+
+        return [rep for _, rep in sorted(found.values(), key=lambda item: item[0])[:k]]
+
+    def stats(self) -> dict:
+        # Counters and timings for each stage, collected while the `instrument`
+        # config option is on. Timings are summarised in microseconds.
+        summary = self._stats.summary()
+        summary['cache'] = self.find_representation.cache_info()._asdict()
+        if (throttle := self._throttle) is not None:
+            summary['throttle'] = throttle.summary()
+        return summary
+
+    def reset_stats(self):
+        self._stats.reset()
+        if (throttle := self._throttle) is not None:
+            throttle.reset()
+
+    def find_representations_parallel(self, nums, max_workers: int | None = None) -> list:
+        # Like calling find_representation() for each number, but spread over
+        # `max_workers` processes (one per CPU by default). Worth it for large
+        # batches, especially with lots of specials or a big max_denominator.
+        # The results are added to this instance's cache.
+        from .parallel import search_parallel
+
+        cache = self.find_representation.cache
+        generation = self._generation
+        results = {}
+        todo = []
+        for num in dict.fromkeys(nums):
+            if (rep := cache.get((generation, num), _MISSING)) is _MISSING:
+                todo.append(num)
+            else:
+                results[num] = rep
+
+        for num, rep in zip(todo, search_parallel(self._conf, todo, max_workers)):
+            results[num] = rep
+            if generation == self._generation:
+                cache.set((generation, num), rep)
+
+        return [results[num] for num in nums]
+
+    def find_representations_batch(self, values, chunk_size: int = 256):
+        # The same search as find_representation(), but for a whole array (or
+        # anything NumPy can read as one, e.g. a buffer) at once. The candidate
+        # grid is tested with broadcast comparisons, `chunk_size` numbers at a
+        # time to keep the intermediate arrays small.
+        # Returns an object array of the same shape, holding a Representation or None for each.
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError(
+                'find_representations_batch() requires NumPy. '
+                'Install it with `pip install printi-davidgilbertson[numpy]`'
+            ) from None
+
+        values = np.asarray(values, dtype=float)
+        nums, inverse = np.unique(values.ravel(), return_inverse=True)
+        reps = np.full(len(nums), None, dtype=object)
+        conf = self._conf
+        tol = conf.tol
+
+        # Mirrors math.isclose(a, b, rel_tol=tol)
+        def isclose(a, b):
+            diff = np.abs(b - a)
+            return (a == b) | (diff <= np.abs(tol * b)) | (diff <= np.abs(tol * a))
+
+        # round() would raise for inf/nan, we just skip them
+        with np.errstate(invalid='ignore'):
+            todo = np.isfinite(nums) & ~isclose(np.round(nums), nums)
+
+        if conf.match == 'best':
+            # Ranking isn't vectorised, but each distinct number is still only searched once
+            for i in np.flatnonzero(todo):
+                reps[i] = self.find_representation(float(nums[i]))
+            todo[:] = False
+
+        # Plain fractions are checked first, they're cheap enough one at a time
+        for i in np.flatnonzero(todo):
+            if rep := self._find_fraction(float(nums[i]), conf):
+                reps[i] = rep
+                todo[i] = False
+
+        index = self._get_index(conf)
+        n_candidates = len(index.candidates)
+        tests = np.array([candidate[0] for candidate in index.candidates])
+        offset_mask = np.zeros(n_candidates, dtype=bool)
+        offset_mask[[position for position, _ in index.offset_candidates]] = True
+        offset_tests = tests[offset_mask]
+        offset_positions = np.flatnonzero(offset_mask)
+
+        def first_true(matrix, positions):
+            # The search position of the first True in each row, or n_candidates
+            return np.where(matrix.any(axis=1), positions[matrix.argmax(axis=1)], n_candidates)
+
+        all_positions = np.arange(n_candidates)
+        todo_indices = np.flatnonzero(todo)
+        for start in range(0, len(todo_indices), chunk_size):
+            chunk_indices = todo_indices[start:start + chunk_size]
+            chunk = nums[chunk_indices][:, None]
+
+            # A candidate is tested for direct, add, sub then mult before moving
+            # to the next, so the earliest position wins, then that order.
+            matches = [
+                ('direct', first_true(isclose(np.abs(chunk), tests), all_positions)),
+                ('add', first_true(np.mod(chunk - offset_tests, 1) == 0, offset_positions)),
+                ('sub', first_true(np.mod(chunk + offset_tests, 1) == 0, offset_positions)),
+                ('mult', first_true(np.mod(chunk / offset_tests, 1) == 0, offset_positions)),
+            ]
+            best = np.min([positions for _, positions in matches], axis=0)
+
+            for row, i in enumerate(chunk_indices):
+                num = float(nums[i])
+                if best[row] == n_candidates:
+                    reps[i] = (
+                            self._find_constant(num, conf)
+                            or self._find_last_resort(num, conf)
+                            or self._search_backends(num, conf, None)
                     )
+                    continue
+
+                for kind, positions in matches:
+                    if positions[row] == best[row]:
+                        reps[i] = self._format_match(num, kind, int(best[row]), conf)
+                        break
+
+        return reps[inverse].reshape(values.shape)
 
-        return last_resort
+    def annotate_frame(self, table, columns: list[str] | None = None, style: bool = False):
+        # Finds representations for the values in a pandas DataFrame or a
+        # PyArrow Table, read straight from the columns rather than from text.
+        # Each distinct value is searched once, with find_representations_batch().
+        # `columns` defaults to all the float columns.
+        # Returns a DataFrame of Representations (or None) with the same index,
+        # or for Arrow, a Table of the rendered text. With style=True, returns
+        # the DataFrame's Styler, showing each representation next to its value.
+        try:
+            from .frame import annotate_frame
+        except ImportError:
+            raise ImportError(
+                'annotate_frame() requires NumPy. '
+                'Install it with `pip install printi-davidgilbertson[numpy]`'
+            ) from None
 
-    @functools.lru_cache(maxsize=1000)
+        return annotate_frame(self, table, columns, style)
+
+    @cached_method
     def find_representations(self, string: str) -> list[str]:
         results = []
+        if '.' not in string:
+            # No decimals, so nothing to find (and no need to load the scanner)
+            return results
+
+        from .scan import find_numbers, find_units
+
         # TODO (@davidgilbertson): make min_decimals an option
         # TODO (@davidgilbertson): add when min_decimals is 0, allow looking up
         #  ints in the specials list. I mean, meh, really? Nah, that's dumb.
-        for num_string in re.findall(r'-?\d+\.\d{4,}', string):
-            # This might be a duplicate, but the function is cached so this isn't
-            # wasteful
-            if rep := self.find_representation(float(num_string)):
-                if (result := f'{self._conf.symbol} {num_string} ≈ {rep}') not in results:
-                    results.append(result)
+        if stats := self._stats if self._stats.enabled else None:
+            start_ns = perf_counter_ns()
+            spans = find_numbers(string)
+            stats.record('scan', perf_counter_ns() - start_ns)
+            stats.count('numbers', len(spans))
+        else:
+            spans = find_numbers(string)
+
+        symbol = self._conf.symbol
+        reps = {}  # {value: rep}, so a value and its negative are only searched once
+
+        def find(num_string: str):
+            num = float(num_string)
+            if num not in reps and num and -num in reps:
+                # E.g. the two parts of 0.7071067811865476-0.7071067811865476j
+                reps[num] = None if reps[-num] is None else -reps[-num]
+            elif num not in reps or reps[num] is not None:
+                # Still looked up if it's a repeat, the cache makes that cheap
+                reps[num] = self.find_representation(num)
+            return reps[num]
+
+        for kind, start, end, members in find_units(string, spans):
+            found = [find(string[member_start:member_end]) for member_start, member_end in members]
+            if not any(found):
+                continue
+
+            text = string[start:end]
+            if kind == 'number':
+                result = f'{symbol} {text} ≈ {found[0]}'
+            elif kind == 'complex':
+                result = f'{symbol} {text} ≈ {_complex_text(string, members, found)}'
+            else:
+                result = f'{symbol} {text} ≈ {_vector_text(string, start, end, members, found)}'
+
+            if result not in results:
+                results.append(result)
 
         return results
 
-    def print_reps(self, value):
-        write = self.original_write or sys.stdout.write
-        for result in self.find_representations(value):
-            write('\n')
-            write(result)
+    def print_reps(self, value, stream=None, after_line: bool = False):
+        if (throttle := self._throttle) is not None:
+            start = thread_time_ns()
+            results = self.find_representations(value)
+            throttle.spend(thread_time_ns() - start)
+        else:
+            results = self.find_representations(value)
+
+        self.write_results(results, stream, after_line)
+
+    def _write(self, text: str, stream=None):
+        # Results go to the stream the text was written to (stdout by default),
+        # bypassing any WatchedStream so they aren't searched themselves
+        if stream is None:
+            stream = sys.stdout
+        if isinstance(stream, WatchedStream):
+            stream = stream.stream
 
-    def watch(self):
-        if self.original_write:
-            print('Already watching')
+        stream.write(text)
+
+        if self._stats.enabled:
+            self._stats.count('writes')
+
+    def write_results(self, results: list[str], stream=None, after_line: bool = False):
+        # Results are normally written before the '\n' of the line they were
+        # found on. With after_line=True (for a value shown by the display hook,
+        # or a line searched by the background worker), that line is already
+        # finished, so each result gets its own '\n'.
+        if not results:
             return
 
-        std_write = sys.stdout.write
-        self.original_write = std_write
+        log_location = self._conf.log_location
+        sink = self._sink
+
+        if log_location == 'batch' or (sink and sink.holding):
+            self._get_sink().add(results)
+        elif after_line:
+            for result in results:
+                self._write(result, stream)
+                self._write('\n', stream)
+        elif log_location == 'line_end':
+            self._write('  ' + '  '.join(results), stream)
+        else:  # line_below
+            for result in results:
+                self._write('\n', stream)
+                self._write(result, stream)
+
+    def flush(self):
+        # Writes any results being held in batch mode
+        if self._sink is not None:
+            self._sink.flush()
 
-        # TODO (@davidgilbertson): for something like this, it interrupts a lot
-        #  for i in range(2, 29):
-        #      print(f'{i=} {math.comb(i, 2) / 365 =}')
-        #  Can I put all the 💡 things at the end? Can I batch? Must I use async?
-        #  Maybe config log_location: Literal['replace', 'line_end', 'line_below', 'batch']
+    def _get_sink(self) -> BatchSink:
+        if self._sink is None:
+            with self._lock:
+                if self._sink is None:
+                    self._sink = BatchSink(self)
+        return self._sink
 
-        def watched_write(value):
-            std_write(value)
+    @contextlib.contextmanager
+    def batch(self):
+        # Holds all results until the end of the block, then writes them at once.
+        #  with printi.batch():
+        #      for i in range(2, 29):
+        #          print(f'{i=} {math.comb(i, 2) / 365 =}')
+        # While any thread is in a batch() block, all results are held
+        sink = self._get_sink()
+        sink.hold()
+        try:
+            yield
+        finally:
+            if self._worker:
+                self._worker.join()
+            sink.release()
+            sink.flush()
 
-            # print() calls this with '\n' for every other write, skip those
-            if value != '\n':
-                self.print_reps(value)
-                # for result in self.find_representations(value):
-                #     std_write('\n')
-                #     std_write(result)
+    def _on_line(self, line: str, stream):
+        # Called by a WatchedStream with each line written, before its '\n'
+        if (display_hook := self._display_hook) is not None and display_hook.displaying:
+            return  # The display hook searches the value itself
 
-        sys.stdout.write = watched_write
+        if (throttle := self._throttle) is not None and not throttle.allow(line, self._conf):
+            return
+
+        if self._worker:
+            self._worker.submit(line, stream)
+        else:
+            self.print_reps(line, stream)
 
-        print('Printi is watching. '
-              f'Representations will be shown with a {self._conf.symbol}. '
-              'Type `printi.unwatch()` to stop.')
+    def _mid_line(self) -> bool:
+        # Whether any thread is part way through writing a line to a watched stream
+        return any(stream.mid_line for stream in list(self._streams.values()))
+
+    def _on_line_written(self):
+        # Batched results that are due are written at the end of a line
+        if self._sink is not None:
+            self._sink.flush_due()
+
+    def wrap(self, stream) -> WatchedStream:
+        # Returns a version of a text stream (any file-like object with a write()
+        # method) that Printi watches
+        return WatchedStream(stream, self)
+
+    def watch(self, background: bool = False, streams: tuple[str, ...] = ('stdout',), display: bool = False):
+        # Replaces each of the named `streams` in `sys` with a WatchedStream.
+        # With background=True, the search runs on a worker thread and the
+        # results are written when they're ready.
+        # With display=True, the values shown by the REPL (or IPython/Jupyter)
+        # are searched from the objects themselves, not from their text
+        with self._lock:
+            if self._streams or self._display_hook:
+                print('Already watching')
+                return
+
+            if background:
+                self._worker = AnnotationWorker(self)
+
+            # Before watching, so it isn't searched
+            print('Printi is watching. '
+                  f'Representations will be shown with a {self._conf.symbol}. '
+                  'Type `printi.unwatch()` to stop.')
+
+            for name in streams:
+                stream = getattr(sys, name)
+                if isinstance(stream, WatchedStream) and stream._printi is self:
+                    continue  # Don't wrap it twice
+
+                self._streams[name] = self.wrap(stream)
+                setattr(sys, name, self._streams[name])
+
+            if display:
+                from .display import DisplayHook
+
+                self._display_hook = DisplayHook(self)
+                self._display_hook.install()
 
     def unwatch(self):
-        if self.original_write:
-            sys.stdout.write = self.original_write
-            self.original_write = None
+        # The worker is stopped outside the lock, since it might need the lock
+        # to finish what it's doing
+        with self._lock:
+            streams, self._streams = self._streams, {}
+            worker, self._worker = self._worker, None
+            for name, stream in streams.items():
+                if getattr(sys, name) is stream:
+                    setattr(sys, name, stream.stream)
+
+            display_hook, self._display_hook = self._display_hook, None
+            if display_hook is not None:
+                display_hook.uninstall()
+
+        for stream in streams.values():
+            stream.finish()
+
+        if worker:
+            worker.stop()
+
+        with self._lock:
+            sink, self._sink = self._sink, None
+        if sink is not None:
+            sink.close()
 
         print('Printi is no longer watching. Type `printi.watch()` to resume.')
 
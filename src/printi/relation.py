@@ -0,0 +1,281 @@
+import math
+from fractions import Fraction as F
+from itertools import combinations
+
+from .representation import ascii_name, latex_name
+
+# Extra values to combine the specials with, as (value, unicode, ascii, latex)
+EXTRA_BASIS = [
+    (math.sqrt(2), '√2', 'sqrt(2)', r'\sqrt{2}'),
+    (math.sqrt(3), '√3', 'sqrt(3)', r'\sqrt{3}'),
+    (math.sqrt(5), '√5', 'sqrt(5)', r'\sqrt{5}'),
+    (math.log(2), 'ln(2)', 'log(2)', r'\ln{2}'),
+]
+
+
+def pslq(x: list[float], max_coeff: int, max_steps: int = 100, tol: float = 1e-10) -> list[int] | None:
+    # Looks for integers a, not all zero and none bigger than max_coeff, where
+    # a[0] * x[0] + a[1] * x[1] + ... is (close to) zero.
+    # This is the PSLQ algorithm of Ferguson, Bailey and Arno, in plain floats.
+    # With ~16 significant digits, it's only reliable for a handful of values
+    # with small coefficients, which is all it's used for here.
+    n = len(x)
+    if n < 2 or not all(math.isfinite(value) and value for value in x):
+        return None
+
+    gamma = math.sqrt(4 / 3)
+    A = [[int(i == j) for j in range(n)] for i in range(n)]
+    B = [[int(i == j) for j in range(n)] for i in range(n)]
+    H = [[0.0] * n for _ in range(n)]
+
+    s = [math.sqrt(sum(value ** 2 for value in x[k:])) for k in range(n)]
+    y = [value / s[0] for value in x]
+    s = [value / s[0] for value in s]
+
+    for i in range(n):
+        if i < n - 1:
+            H[i][i] = s[i + 1] / s[i] if s[i] else 0.0
+        for j in range(i):
+            sjj1 = s[j] * s[j + 1]
+            H[i][j] = -y[i] * y[j] / sjj1 if sjj1 else 0.0
+
+    def reduce(i, j):
+        if not H[j][j]:
+            return False
+        t = round(H[i][j] / H[j][j])
+        if t:
+            y[j] += t * y[i]
+            for k in range(j + 1):
+                H[i][k] -= t * H[j][k]
+            for k in range(n):
+                A[i][k] -= t * A[j][k]
+                B[k][j] += t * B[k][i]
+        return True
+
+    for i in range(1, n):
+        for j in range(i - 1, -1, -1):
+            reduce(i, j)
+
+    for _ in range(max_steps):
+        m = max(range(n - 1), key=lambda i: gamma ** (i + 1) * abs(H[i][i]))
+
+        y[m], y[m + 1] = y[m + 1], y[m]
+        H[m], H[m + 1] = H[m + 1], H[m]
+        A[m], A[m + 1] = A[m + 1], A[m]
+        for row in B:
+            row[m], row[m + 1] = row[m + 1], row[m]
+
+        if m < n - 2:
+            t0 = math.hypot(H[m][m], H[m][m + 1])
+            if not t0:
+                break
+            t1 = H[m][m] / t0
+            t2 = H[m][m + 1] / t0
+            for i in range(m, n):
+                t3 = H[i][m]
+                t4 = H[i][m + 1]
+                H[i][m] = t1 * t3 + t2 * t4
+                H[i][m + 1] = -t2 * t3 + t1 * t4
+
+        for i in range(m + 1, n):
+            for j in range(min(i - 1, m + 1), -1, -1):
+                if not reduce(i, j):
+                    break
+
+        for i in range(n):
+            if abs(y[i]) < tol:
+                relation = [B[j][i] for j in range(n)]
+                if max(abs(a) for a in relation) <= max_coeff:
+                    return relation
+
+        # No relation can be smaller than this, so if it's too big, give up
+        biggest = max(abs(value) for row in H for value in row)
+        if not biggest or 1 / biggest > max_coeff:
+            break
+
+    return None
+
+
+class Combination:
+    # A sum of rational multiples of basis values, e.g. 2√3 - π/4, found by
+    # RelationSearch. It has the same interface as Representation.
+    # Each term is (coefficient, value, unicode, ascii, latex), where the
+    # constant term has a value of 1 and no names.
+    __slots__ = ('terms', 'error', 'kind', '_text')
+
+    def __init__(self, terms: list[tuple], error: float = 0.0, kind: str = 'relation'):
+        self.terms = terms
+        self.error = error
+        self.kind = kind
+        self._text = None
+
+    @property
+    def value(self) -> float:
+        return sum(coeff.numerator * value / coeff.denominator for coeff, value, *_ in self.terms)
+
+    @property
+    def complexity(self) -> int:
+        cost = 0
+        for coeff, value, *names in self.terms:
+            cost += len(str(abs(coeff.numerator))) if abs(coeff.numerator) != 1 or names[0] is None else 0
+            cost += len(str(coeff.denominator)) if coeff.denominator != 1 else 0
+            cost += 1 if names[0] is not None else 0
+
+        return cost
+
+    def key(self) -> tuple:
+        return tuple((coeff, names[0]) for coeff, value, *names in self.terms)
+
+    def render(self, style: str = 'unicode') -> str:
+        if style == 'unicode':
+            if self._text is None:
+                self._text = self._render(0)
+            return self._text
+
+        return self._render(('unicode', 'ascii', 'latex').index(style))
+
+    def _render(self, style: int) -> str:
+        result = ''
+        for i, (coeff, value, *names) in enumerate(self.terms):
+            n = abs(coeff.numerator)
+            d = coeff.denominator
+            name = names[style]
+
+            if style == 2:
+                top = str(n) if name is None else name if n == 1 else f'{n}{name}'
+                term = top if d == 1 else rf'\frac{{{top}}}{{{d}}}'
+            else:
+                times = '*' if style == 1 else ''
+                term = str(n) if name is None else name if n == 1 else f'{n}{times}{name}'
+                term = term if d == 1 else f'{term}/{d}'
+
+            if i == 0:
+                result = f'-{term}' if coeff < 0 else term
+            else:
+                result += f' - {term}' if coeff < 0 else f' + {term}'
+
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            'terms': [[coeff.numerator, coeff.denominator, *rest] for coeff, *rest in self.terms],
+            'error': self.error,
+            'kind': self.kind,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Combination':
+        terms = [(F(n, d), *rest) for n, d, *rest in data['terms']]
+        return cls(terms, data['error'], data['kind'])
+
+    def __neg__(self) -> 'Combination':
+        terms = [(-coeff, *rest) for coeff, *rest in self.terms]
+        terms.sort(key=lambda term: term[0] < 0)  # Positive first, as RelationSearch does
+        return Combination(terms, self.error, self.kind)
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f'<Combination {self.render()}>'
+
+    def __eq__(self, other):
+        if isinstance(other, Combination):
+            return self.key() == other.key()
+        if isinstance(other, str):
+            return self.render() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.render())
+
+
+class RelationSearch:
+    # A backend for Printi (see the `backends` config option) that finds sums of
+    # up to `max_terms` constants, e.g. π + e or 2√3 - π/4, that the main search
+    # can't. The constants are the specials, their squares, square roots and
+    # logs, plus EXTRA_BASIS, with any that are rational multiples of each
+    # other dropped (so with π and τ, only π is used).
+    # It runs an integer relation search (PSLQ) on the number, 1 and each small
+    # group of constants, simplest first, until it finds a relation with no
+    # coefficient bigger than `max_coeff` that gives back the number to within
+    # `tol`, or it's tried `max_groups` groups.
+    # The budget is a count rather than a time, so whether a number is found
+    # doesn't depend on how busy the machine is (and a miss is safe to cache).
+    def __init__(self, max_coeff: int = 20, max_terms: int = 2, max_groups: int = 100, tol: float = 1e-12):
+        self.max_coeff = max_coeff
+        self.max_terms = max_terms
+        self.max_groups = max_groups
+        self.tol = tol
+        self._basis = None
+        self._basis_key = None
+
+    def __repr__(self):
+        return (
+            f'RelationSearch(max_coeff={self.max_coeff}, max_terms={self.max_terms}, '
+            f'max_groups={self.max_groups}, tol={self.tol})'
+        )
+
+    def get_basis(self, specials: dict[float, str]) -> list[tuple]:
+        key = tuple(sorted(specials.items()))
+        if self._basis_key != key:
+            elements = []
+            for const, name in specials.items():
+                ascii, latex = ascii_name(name), latex_name(name)
+                elements.append((const, name, ascii, latex))
+                elements.append((const ** 2, f'{name}²', f'{ascii}**2', f'{latex}^{{2}}'))
+                if const > 0:
+                    elements.append((math.sqrt(const), f'√{name}', f'sqrt({ascii})', rf'\sqrt{{{latex}}}'))
+                    elements.append((math.log(const), f'ln({name})', f'log({ascii})', rf'\ln{{{latex}}}'))
+
+            basis = []
+            for element in elements + EXTRA_BASIS:
+                # Skip anything that's rational (ln(e)), or a rational combination
+                # of 1 and something already in the basis (τ is 2π)
+                if pslq([1.0, element[0]], self.max_coeff) or any(
+                        pslq([1.0, other[0], element[0]], self.max_coeff) for other in basis
+                ):
+                    continue
+                basis.append(element)
+
+            self._basis = basis
+            self._basis_key = key
+
+        return self._basis
+
+    def __call__(self, num: float, conf) -> Combination | None:
+        basis = self.get_basis(conf.specials)
+        budget = self.max_groups
+
+        for size in range(1, self.max_terms + 1):
+            for group in combinations(basis, size):
+                if budget <= 0:
+                    return None
+                budget -= 1
+
+                relation = pslq([num, 1.0, *(element[0] for element in group)], self.max_coeff)
+                if relation is None or relation[0] == 0:
+                    continue
+
+                # a0 * num + a1 + a2 * x + ... = 0, so num = -(a1 + a2 * x + ...) / a0
+                a0, a1, *rest = relation
+                terms = [
+                    (F(-a, a0), *element)
+                    for a, element in zip(rest, group)
+                    if a != 0
+                ]
+                if len(terms) < size:
+                    continue  # It'll be found with fewer terms, or it's a plain fraction
+
+                if a1 != 0:
+                    terms.insert(0, (F(-a1, a0), 1.0, None, None, None))
+
+                # Start with a positive term if there is one, e.g. e² - π not -π + e²
+                terms.sort(key=lambda term: term[0] < 0)
+
+                rep = Combination(terms)
+                if math.isclose(rep.value, num, rel_tol=self.tol):
+                    rep.error = abs(num - rep.value)
+                    return rep
+
+        return None
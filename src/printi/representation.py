@@ -0,0 +1,341 @@
+import unicodedata
+
+# fractions is imported where it's used, since importing it is slow, and
+# a Representation is only rendered once it's displayed
+
+
+def complexity(mult: int = 1, div: int = 1, power: 'F | int' = 1, add: int = 0, const: bool = True) -> int:
+    # Roughly how many symbols it takes to write a representation, lower is simpler.
+    # A constant costs 1, each number costs its digits, any power costs 1, and
+    # a negative power costs 2 more, since it's a fraction with the constant
+    # on the bottom (so √2/2 beats 1/√2).
+    # None of the parts can make it cheaper, so the cost of a candidate before
+    # the add/mult is worked out is a lower bound on any match built from it.
+    cost = 1 if const else 0
+    if abs(mult) != 1 or not const:
+        cost += len(str(abs(mult)))
+    if div != 1 or not const:
+        cost += len(str(div))
+    if power != 1:
+        cost += 1 if power > 0 else 3
+    if add != 0:
+        cost += len(str(abs(add)))
+
+    return cost
+
+
+class Representation:
+    # A match found by the search, in the form: add ± mult * const ** power / div
+    # The sign (-1 or 1) applies to the mult * const ** power / div part.
+    # For a plain fraction (mult/div), const is None.
+    # `name` is the special's name at the time of the search (e.g. 'π'), or None
+    # for digits, `kind` is which pattern matched, and `error` is how far the
+    # value of this is from the number it was found for.
+    # It's only turned into text when it's displayed, with render().
+    __slots__ = ('const', 'name', 'add', 'mult', 'power', 'div', 'sign', 'error', 'kind', '_text')
+
+    def __init__(
+            self,
+            const: float | None,
+            name: str | None = None,
+            add: int = 0,
+            mult: int = 1,
+            power: 'F | int' = 1,
+            div: int = 1,
+            sign: int = 1,
+            error: float = 0.0,
+            kind: str = 'direct',
+    ):
+        self.const = const
+        self.name = name
+        self.add = add
+        self.mult = mult
+        self.power = power
+        self.div = div
+        self.sign = sign
+        self.error = error
+        self.kind = kind
+        self._text = None
+
+    @classmethod
+    def fraction(cls, frac: 'F', error: float = 0.0) -> 'Representation':
+        return cls(None, mult=frac.numerator, div=frac.denominator, error=error, kind='fraction')
+
+    @property
+    def value(self) -> float:
+        if self.const is None:
+            return self.mult / self.div
+        # A float power is much quicker than a Fraction, and gives the same result
+        power = self.power if isinstance(self.power, int) else float(self.power)
+        return self.add + self.sign * self.mult * self.const ** power / self.div
+
+    @property
+    def complexity(self) -> int:
+        return complexity(self.mult, self.div, self.power, self.add, const=self.const is not None)
+
+    def key(self) -> tuple:
+        # Everything the text depends on, so equal representations hash the same
+        return self.const, self.name, self.add, self.mult, self.power, self.div, self.sign
+
+    def render(self, style: str = 'unicode') -> str:
+        # style is 'unicode' (e.g. 2π²/3), 'ascii' (2*pi**2/3, which is valid
+        # Python given `from math import *`) or 'latex' (\frac{2\pi^{2}}{3})
+        if style == 'unicode':
+            if self._text is None:
+                self._text = RENDERERS[style](self)
+            return self._text
+
+        return RENDERERS[style](self)
+
+    def to_dict(self) -> dict:
+        power = self.power
+        return {
+            'const': self.const,
+            'name': self.name,
+            'add': self.add,
+            'mult': self.mult,
+            'power': power if isinstance(power, int) else [power.numerator, power.denominator],
+            'div': self.div,
+            'sign': self.sign,
+            'error': self.error,
+            'kind': self.kind,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Representation':
+        from fractions import Fraction as F
+
+        data = dict(data)
+        if isinstance(data['power'], list):
+            data['power'] = F(*data['power'])
+        return cls(**data)
+
+    def __neg__(self) -> 'Representation':
+        # The same match for the negative of the number: a fraction, a match
+        # with an integer added, or a multiple, has its numbers negated (1 + π/3
+        # becomes -1 - π/3), anything else has its sign flipped (π/3 becomes -π/3).
+        if self.const is None or self.add or self.mult < 0 or self.kind == 'mult':
+            add, mult, sign = -self.add, -self.mult, self.sign
+        else:
+            add, mult, sign = self.add, self.mult, -self.sign
+        kind = {'add': 'sub', 'sub': 'add'}.get(self.kind, self.kind)
+
+        return Representation(self.const, self.name, add, mult, self.power, self.div, sign, self.error, kind)
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f'<Representation {self.render()}>'
+
+    def __eq__(self, other):
+        if isinstance(other, Representation):
+            return self.key() == other.key()
+        if isinstance(other, str):
+            return self.render() == other
+        return NotImplemented
+
+    def __hash__(self):
+        # The same as the string, since they compare equal. The text only
+        # depends on key(), so this agrees with comparing keys too.
+        return hash(self.render())
+
+
+def _render_unicode(rep: Representation) -> str:
+    from fractions import Fraction as F
+
+    # The base form is: add + mult * const ** power / div
+    # The code below starts with const and appends/prepends the other parts
+    # to build the return string
+    add = rep.add
+    mult = rep.mult
+    div = rep.div
+    flip_sign = rep.sign < 0
+    const = rep.const
+
+    if const is None:
+        n = mult
+        d = div
+        if n > d:
+            return f'{n // d} + {n % d}/{d}'
+
+        return f'{n}/{d}'
+
+    assert div >= 1
+
+    result = const if rep.name is None else rep.name
+
+    const_on_top = rep.power > 0
+    power = abs(rep.power)
+
+    if power == F(1, 2):
+        result = f'√{result}'
+    elif power == F(1, 3):
+        result = f'∛{result}'
+    elif power == 2:
+        result = f'{result}²'
+    elif power == 3:
+        result = f'{result}³'
+    elif power == 4:
+        result = f'{result}⁴'
+    elif power != 1:
+        result = f'{result}^{power}'
+
+    sub_from = 0
+    if add != 0 and mult < 0:
+        sub_from = add
+        add = 0
+        mult *= -1
+
+    if const_on_top:
+        if mult != 1:
+            if isinstance(result, float):
+                result *= mult
+            elif power > 1 and isinstance(const, int):
+                result = f'{mult}×{result}'
+            else:
+                result = f'{mult}{result}'
+
+        if div != 1:
+            result = f'{result}/{div}'
+    else:  # const is on the bottom
+        if div != 1:
+            if isinstance(result, float):
+                result *= div
+            elif power > 1 and isinstance(const, int):
+                result = f'({div}×{result})'  # e.g. 3×5²
+            else:
+                result = f'{div}{result}'  # e.g. 3π
+
+        result = f'{mult}/{result}'
+
+    return _with_add(str(result), add, sub_from, flip_sign)
+
+
+def _with_add(result: str, add: int, sub_from: int, flip_sign: bool) -> str:
+    if add > 0:
+        sign = '-' if flip_sign else '+'
+        return f'{add} {sign} {result}'
+    if add < 0:
+        sign = '-' if flip_sign else ''
+        return f'{sign}{result} - {abs(add)}'
+    if sub_from != 0:
+        # subtracting a negative is addition, so the sign is flipped here
+        sign = '+' if flip_sign else '-'
+        return f'{sub_from} {sign} {result}'
+
+    sign = '-' if flip_sign else ''
+    return f'{sign}{result}'
+
+
+def _split_add(rep: Representation) -> tuple[int, int, int]:
+    # Returns add, mult, sub_from, the way the unicode renderer rearranges them
+    if rep.add != 0 and rep.mult < 0:
+        return 0, -rep.mult, rep.add
+    return rep.add, rep.mult, 0
+
+
+def _greek_name(name: str) -> str | None:
+    # 'π' -> 'pi', or None if it's not a single Greek letter
+    if len(name) == 1 and unicodedata.name(name, '').startswith('GREEK SMALL LETTER'):
+        return unicodedata.name(name).split()[-1].lower()
+
+
+def ascii_name(name: str) -> str:
+    return _greek_name(name) or name
+
+
+def latex_name(name: str) -> str:
+    greek = _greek_name(name)
+    return rf'\{greek}' if greek else name
+
+
+def _render_ascii(rep: Representation) -> str:
+    from fractions import Fraction as F
+
+    if rep.const is None:
+        n, d = rep.mult, rep.div
+        return f'{n // d} + {n % d}/{d}' if n > d else f'{n}/{d}'
+
+    if rep.name is None:
+        base = repr(rep.const)
+    else:
+        base = ascii_name(rep.name)
+
+    power = abs(rep.power)
+    if power == 1:
+        term = base
+    elif power == F(1, 2):
+        term = f'sqrt({base})'
+    elif isinstance(power, F) and power.denominator != 1:
+        term = f'{base}**({power})'
+    else:
+        term = f'{base}**{power}'
+
+    add, mult, sub_from = _split_add(rep)
+    if rep.power > 0:
+        if mult != 1:
+            term = f'{mult}*{term}'
+        if rep.div != 1:
+            term = f'{term}/{rep.div}'
+    else:
+        if rep.div != 1:
+            term = f'({rep.div}*{term})'
+        term = f'{mult}/{term}'
+
+    return _with_add(term, add, sub_from, rep.sign < 0)
+
+
+def _render_latex(rep: Representation) -> str:
+    from fractions import Fraction as F
+
+    if rep.const is None:
+        n, d = rep.mult, rep.div
+        if n > d:
+            return rf'{n // d} + \frac{{{n % d}}}{{{d}}}'
+        sign = '-' if n < 0 else ''
+        return rf'{sign}\frac{{{abs(n)}}}{{{d}}}'
+
+    if rep.name is None:
+        base = str(rep.const)
+    else:
+        base = latex_name(rep.name)
+
+    power = abs(rep.power)
+    if power == 1:
+        term = base
+    elif power == F(1, 2):
+        term = rf'\sqrt{{{base}}}'
+    elif power == F(1, 3):
+        term = rf'\sqrt[3]{{{base}}}'
+    else:
+        term = f'{base}^{{{power}}}'
+
+    # A number next to a number needs a dot, a number next to a symbol doesn't
+    joiner = r' \cdot ' if rep.name is None and power != F(1, 2) and power != F(1, 3) else ''
+
+    add, mult, sub_from = _split_add(rep)
+    flip_sign = rep.sign < 0
+    if mult < 0:
+        # Keep the sign outside the fraction, -\frac{2}{3} not \frac{-2}{3}
+        mult *= -1
+        flip_sign = not flip_sign
+
+    if rep.power > 0:
+        if mult != 1:
+            term = f'{mult}{joiner}{term}'
+        if rep.div != 1:
+            term = rf'\frac{{{term}}}{{{rep.div}}}'
+    else:
+        if rep.div != 1:
+            term = f'{rep.div}{joiner}{term}'
+        term = rf'\frac{{{mult}}}{{{term}}}'
+
+    return _with_add(term, add, sub_from, flip_sign)
+
+
+RENDERERS = {
+    'unicode': _render_unicode,
+    'ascii': _render_ascii,
+    'latex': _render_latex,
+}
@@ -0,0 +1,119 @@
+import re
+
+# A number is `-?\d+\.\d{4,}`. Rather than trying that pattern at every position
+# (which backtracks over every run of digits), find the decimal part first and
+# walk back over the integer part. Same matches, but linear in the length.
+_DECIMALS = re.compile(r'\.\d{4,}')
+_BYTES_DECIMALS = re.compile(rb'\.\d{4,}')
+_DIGITS = range(ord('0'), ord('9') + 1)
+_MINUS = ord('-')
+
+
+def find_numbers(text: str | bytes | bytearray | memoryview) -> list[tuple[int, int]]:
+    # Returns the (start, end) span of each number in text, in order.
+    # Bytes-like input is scanned in place, without copying.
+    if isinstance(text, str):
+        # Most text has no decimal numbers at all, this is the cheapest way out
+        if '.' not in text:
+            return []
+
+        return _find_spans(_DECIMALS, text, str.isdecimal, '-')
+
+    if isinstance(text, (bytes, bytearray)) and b'.' not in text:
+        return []
+
+    return _find_spans(_BYTES_DECIMALS, text, _DIGITS.__contains__, _MINUS)
+
+
+def _find_spans(pattern: re.Pattern, text, is_digit, minus) -> list[tuple[int, int]]:
+    spans = []
+    last_end = 0
+    for match in pattern.finditer(text):
+        start, end = match.span()
+
+        i = start
+        while i > last_end and is_digit(text[i - 1]):
+            i -= 1
+
+        # Something like .12345, with no integer part
+        if i == start:
+            continue
+
+        if i > last_end and text[i - 1] == minus:
+            i -= 1
+
+        spans.append((i, end))
+        last_end = end
+
+    return spans
+
+
+# What can be between the brackets of a tuple/list/array of numbers
+_VECTOR_CHARS = frozenset('0123456789.-+eEj, \t')
+_OPEN = '(['
+_CLOSE = {'(': ')', '[': ']'}
+
+
+def find_units(text: str, spans: list[tuple[int, int]]) -> list[tuple[str, int, int, list[tuple[int, int]]]]:
+    # Groups the numbers found by find_numbers() into the values they're part of,
+    # as (kind, start, end, spans), where kind is:
+    #  - 'number', a number on its own
+    #  - 'complex', a complex literal like 0.7071067811865476-0.7071067811865476j, or
+    #    an imaginary one like 0.5235987755982988j. The spans are the real part (if
+    #    it's one of the numbers) and the imaginary part
+    #  - 'vector', a tuple, list or array, like (1.0471975511965976, 0.5) or
+    #    [0.78539816 1.57079633], made of only numbers, commas and spaces.
+    # Each character is looked at a bounded number of times, so this stays linear.
+    units = []
+    last_end = 0
+    no_vector_before = 0  # Where the last failed look for a closing bracket got to
+    i = 0
+    while i < len(spans):
+        start, end = spans[i]
+
+        # Inside brackets? Walk back to an opening one, then forward to its closing one
+        if start >= no_vector_before:
+            open_at = start - 1
+            while open_at >= last_end and text[open_at] in _VECTOR_CHARS:
+                open_at -= 1
+
+            if open_at >= last_end and text[open_at] in _OPEN:
+                close_at = end
+                while close_at < len(text) and text[close_at] in _VECTOR_CHARS:
+                    close_at += 1
+
+                if close_at < len(text) and text[close_at] == _CLOSE[text[open_at]]:
+                    inner = text[open_at + 1:close_at].strip(' \t,')
+                    members = []
+                    while i < len(spans) and spans[i][1] <= close_at:
+                        members.append(spans[i])
+                        i += 1
+
+                    if len(inner.replace(',', ' ').split()) > 1:
+                        units.append(('vector', open_at, close_at + 1, members))
+                        last_end = close_at + 1
+                        continue
+
+                    i -= len(members)  # Just one number in brackets, e.g. f(1.2345)
+                else:
+                    no_vector_before = close_at
+
+        # A complex number, with both parts found
+        if i + 1 < len(spans):
+            next_start, next_end = spans[i + 1]
+            joined = next_start == end or (next_start == end + 1 and text[end] == '+')
+            if joined and text[next_end:next_end + 1] == 'j':
+                units.append(('complex', start, next_end + 1, [spans[i], spans[i + 1]]))
+                last_end = next_end + 1
+                i += 2
+                continue
+
+        if text[end:end + 1] == 'j':
+            units.append(('complex', start, end + 1, [spans[i]]))
+            last_end = end + 1
+        else:
+            units.append(('number', start, end, [spans[i]]))
+            last_end = end
+        i += 1
+
+    return units
@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+
+
+class Histogram:
+    # Latencies in nanoseconds, bucketed by powers of two
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = Counter()  # bucket -> count, where bucket b holds values < 2 ** b
+
+    def add(self, ns: int):
+        self.count += 1
+        self.total += ns
+        self.max = max(self.max, ns)
+        self.buckets[ns.bit_length()] += 1
+
+    def percentile(self, p: float) -> int:
+        # The upper bound of the bucket holding the p-th percentile
+        target = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2 ** bucket, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ms': self.total / 1e6,
+            'mean_us': self.total / self.count / 1e3 if self.count else 0,
+            'p50_us': self.percentile(50) / 1e3,
+            'p99_us': self.percentile(99) / 1e3,
+            'max_us': self.max / 1e3,
+        }
+
+
+class Stats:
+    # Counters and latency histograms for each stage of the search.
+    # Everything that records checks `enabled` first, so when it's off the only
+    # cost is that one attribute lookup.
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.counters = Counter()
+        self.timings = defaultdict(Histogram)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def record(self, name: str, ns: int):
+        self.timings[name].add(ns)
+
+    def summary(self) -> dict:
+        return {
+            'counters': dict(self.counters),
+            'timings': {name: histogram.summary() for name, histogram in self.timings.items()},
+        }
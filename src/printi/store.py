@@ -0,0 +1,63 @@
+import hashlib
+import sqlite3
+import struct
+import threading
+
+_MISSING = object()
+
+
+class DiskStore:
+    # Keeps find_representation() results in an SQLite database, so they survive
+    # restarts and are shared between processes. Rows are keyed by a hash of the
+    # config that produced them and the bit pattern of the number.
+    # The database is in WAL mode, so any number of processes can read while
+    # one writes, and each thread gets its own connection.
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS representations ('
+                ' config TEXT NOT NULL,'
+                ' num INTEGER NOT NULL,'
+                ' rep TEXT,'
+                ' PRIMARY KEY (config, num)'
+                ') WITHOUT ROWID'
+            )
+            self._local.conn = conn
+
+        return conn
+
+    @staticmethod
+    def num_key(num: float) -> int:
+        return struct.unpack('<q', struct.pack('<d', num))[0]
+
+    @staticmethod
+    def config_key(*parts) -> str:
+        # Floats are repr'd, so the key changes if any bit of a special changes
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def get(self, config_key: str, num: float, default=None):
+        row = self._connect().execute(
+            'SELECT rep FROM representations WHERE config = ? AND num = ?',
+            (config_key, self.num_key(num)),
+        ).fetchone()
+
+        return default if row is None else row[0]
+
+    def set(self, config_key: str, num: float, rep: str | None):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO representations (config, num, rep) VALUES (?, ?, ?)',
+            (config_key, self.num_key(num), rep),
+        )
+
+    def close(self):
+        if conn := getattr(self._local, 'conn', None):
+            conn.close()
+            self._local.conn = None
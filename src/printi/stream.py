@@ -0,0 +1,197 @@
+import io
+import threading
+
+
+class WatchedStream(io.TextIOBase):
+    # Wraps a text stream (e.g. sys.stdout) so that Printi sees whole lines.
+    # Text is passed straight through to the stream, and held on to until the
+    # end of the line, so each line is searched once, however many writes it
+    # took (print() does at least two), and a number split over two writes is
+    # still found.
+    # Results are written just before the line's '\n'.
+    # A '\r' (e.g. from a progress bar) starts the line again, so only the text
+    # after the last one is kept, and a line redrawn many times doesn't pile up.
+    # Each thread's partial line is kept separately, so threads printing at the
+    # same time don't mix up each other's lines, and don't need to take a lock.
+    def __init__(self, stream, printi):
+        self.stream = stream
+        self._printi = printi
+        self._local = threading.local()
+        self._buffer = None
+        self._mid_line = set()  # The threads part way through a line
+
+    @property
+    def mid_line(self) -> bool:
+        # Whether any thread has written part of a line, so writing anything else
+        # now would land in the middle of it
+        return bool(self._mid_line)
+
+    @property
+    def _pending(self) -> list[str]:
+        try:
+            return self._local.pending
+        except AttributeError:
+            self._local.pending = []
+            return self._local.pending
+
+    def write(self, text: str) -> int:
+        pending = self._pending
+        start = 0
+        while (newline := text.find('\n', start)) != -1:
+            if newline > start:
+                self.stream.write(text[start:newline])
+            self._add(pending, text[start:newline])
+            self._end_line()
+            self.stream.write('\n')
+            self._printi._on_line_written()
+            start = newline + 1
+
+        if start < len(text):
+            self.stream.write(text[start:])
+            self._add(pending, text[start:])
+
+        if pending:
+            self._mid_line.add(threading.get_ident())
+        else:
+            self._mid_line.discard(threading.get_ident())
+        return len(text)
+
+    @staticmethod
+    def _add(pending: list[str], text: str):
+        # A '\r' at the very end might be the start of a '\r\n', so it only
+        # counts once something other than the '\n' follows it
+        if text and pending and pending[-1].endswith('\r'):
+            pending.clear()
+        if (cr := text.rfind('\r', 0, len(text) - 1)) != -1:
+            pending.clear()
+            text = text[cr + 1:]
+        pending.append(text)
+
+    def _end_line(self):
+        # Searches this thread's line
+        pending = self._pending
+        line = ''.join(pending)
+        pending.clear()
+        self._mid_line.discard(threading.get_ident())
+        if line:
+            self._printi._on_line(line, self.stream)
+
+    def finish(self):
+        # Searches whatever is left of an unfinished line
+        self._end_line()
+
+    def flush(self):
+        self.stream.flush()
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            self._buffer = WatchedBuffer(self)
+        return self._buffer
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+    @property
+    def errors(self):
+        return self.stream.errors
+
+    @property
+    def newlines(self):
+        return getattr(self.stream, 'newlines', None)
+
+    def fileno(self) -> int:
+        return self.stream.fileno()
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+    def writable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self.stream.closed
+
+    def close(self):
+        # We don't own the stream, so leave it open
+        self.finish()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class WatchedBuffer(io.BufferedIOBase):
+    # The binary side of a WatchedStream (i.e. sys.stdout.buffer), for code that
+    # writes bytes. Lines are decoded with the stream's encoding to be searched,
+    # the bytes themselves are passed through untouched.
+    def __init__(self, text_stream: WatchedStream):
+        self._text_stream = text_stream
+        self.raw_buffer = text_stream.stream.buffer
+        self._local = threading.local()
+
+    @property
+    def _pending(self) -> bytearray:
+        try:
+            return self._local.pending
+        except AttributeError:
+            self._local.pending = bytearray()
+            return self._local.pending
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        stream = self._text_stream.stream
+        pending = self._pending
+
+        # Anything written as text so far goes first
+        stream.flush()
+
+        start = 0
+        while (newline := data.find(b'\n', start)) != -1:
+            self.raw_buffer.write(data[start:newline])
+            self._add(pending, data[start:newline])
+            line = pending.decode(stream.encoding or 'utf-8', errors='replace')
+            pending.clear()
+            if line:
+                self._text_stream._printi._on_line(line, stream)
+                stream.flush()
+            self.raw_buffer.write(b'\n')
+            start = newline + 1
+
+        self.raw_buffer.write(data[start:])
+        self._add(pending, data[start:])
+        return len(data)
+
+    @staticmethod
+    def _add(pending: bytearray, data: bytes):
+        # As WatchedStream._add(), a '\r' starts the line again
+        if data and pending.endswith(b'\r'):
+            pending.clear()
+        if (cr := data.rfind(b'\r', 0, len(data) - 1)) != -1:
+            pending.clear()
+            data = data[cr + 1:]
+        pending += data
+
+    def flush(self):
+        self.raw_buffer.flush()
+
+    def fileno(self) -> int:
+        return self.raw_buffer.fileno()
+
+    def isatty(self) -> bool:
+        return self.raw_buffer.isatty()
+
+    def writable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self.raw_buffer.closed
+
+    def close(self):
+        # We don't own the buffer, so leave it open
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.raw_buffer, name)
@@ -0,0 +1,78 @@
+import re
+import threading
+from collections import Counter
+from time import monotonic_ns
+
+NUMBER_RE = re.compile(r'\d+')
+MAX_TEMPLATES = 10_000  # Per second, so a line full of unique text can't use up memory
+
+
+class Throttle:
+    # Decides which watched lines get searched when there's a lot of output, so
+    # Printi can be left on without slowing a program down. Every second:
+    #  - once more than `max_line_rate` lines have been written (this second or
+    #    the last), no more are searched until the rate drops
+    #  - once `cpu_budget` seconds of CPU time have gone on searching, no more
+    #    lines are searched
+    #  - only the first `sample_repeats` lines of each template (the line with
+    #    its numbers replaced, e.g. 'step # loss #.#') are searched
+    # Any of these can be None to turn it off. How many lines were skipped for
+    # each reason is counted, see Printi.stats().
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self._window_end = 0
+        self._lines = 0
+        self._last_lines = 0
+        self._spent = 0
+        self._templates = {}
+
+    def allow(self, line: str, conf) -> bool:
+        now = monotonic_ns()
+        with self._lock:
+            if now >= self._window_end:
+                # A gap of more than a second means nothing was written last second
+                self._last_lines = self._lines if now - self._window_end < 1_000_000_000 else 0
+                self._window_end = now + 1_000_000_000
+                self._lines = 0
+                self._spent = 0
+                self._templates.clear()
+
+            self._lines += 1
+            self.counters['lines'] += 1
+
+            if conf.max_line_rate is not None and max(self._lines, self._last_lines) > conf.max_line_rate:
+                self.counters['skipped.rate'] += 1
+                return False
+
+            if conf.cpu_budget is not None and self._spent >= conf.cpu_budget * 1e9:
+                self.counters['skipped.budget'] += 1
+                return False
+
+            if conf.sample_repeats is not None:
+                template = NUMBER_RE.sub('#', line)
+                seen = self._templates.get(template, 0)
+                if seen >= conf.sample_repeats:
+                    self.counters['skipped.sampled'] += 1
+                    return False
+                if len(self._templates) < MAX_TEMPLATES:
+                    self._templates[template] = seen + 1
+
+            self.counters['searched'] += 1
+            return True
+
+    def spend(self, ns: int):
+        # Called with the CPU time each search took, from whichever thread ran it
+        with self._lock:
+            self._spent += ns
+            self.counters['cpu_ns'] += ns
+
+    def reset(self):
+        with self._lock:
+            self.counters = Counter()
+
+    def summary(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        skipped = sum(n for name, n in counters.items() if name.startswith('skipped.'))
+        return {**counters, 'skipped': skipped}
@@ -0,0 +1,196 @@
+import unittest
+from math import pi, e, sqrt
+from unittest.mock import patch
+
+from src.printi.cache import RepresentationCache
+from src.printi.printi import Printi
+
+
+class TestCache(unittest.TestCase):
+    def test_lru(self):
+        cache = RepresentationCache(maxsize=2, policy='lru')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)  # Evicts b, which was used least recently
+
+        self.assertEqual(['a', 'c'], cache.keys())
+        self.assertEqual((1, 0, 1, 2, 2), tuple(cache.info()))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.info().misses)
+
+    def test_lfu(self):
+        cache = RepresentationCache(maxsize=2, policy='lfu')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('b')
+        cache.get('b')
+        cache.get('a')
+        cache.set('c', 3)  # Evicts a, which was used least often
+
+        self.assertEqual(['b', 'c'], sorted(cache.keys()))
+        cache.set('d', 4)  # c and d have been used once each, so the older goes
+        self.assertEqual(['b', 'd'], sorted(cache.keys()))
+        self.assertEqual(2, cache.info().evictions)
+
+    def test_ttl(self):
+        cache = RepresentationCache(maxsize=10, policy='ttl', ttl=5)
+        with patch('time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with patch('time.monotonic', return_value=104):
+            self.assertEqual(1, cache.get('a'))
+        with patch('time.monotonic', return_value=105):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual((1, 1, 1, 10, 0), tuple(cache.info()))
+
+        with self.assertRaises(ValueError):
+            RepresentationCache(policy='ttl')
+
+    def test_rekey(self):
+        cache = RepresentationCache(maxsize=3, policy='lfu')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.get('a')
+        cache.get('a')
+        cache.get('c')
+
+        # Drop b, and change the others
+        cache.rekey(lambda key, value: None if key == 'b' else (key.upper(), value * 10))
+        self.assertEqual(['A', 'C'], cache.keys())
+        self.assertEqual(10, cache.get('A'))
+
+        # The use counts were kept, so C is still used less than A
+        cache.set('d', 4)
+        cache.set('e', 5)
+        self.assertEqual(['A', 'C', 'e'], sorted(cache.keys()))
+
+        # func is called without the lock, so the cache can be used meanwhile.
+        # What's added meanwhile is kept, and what's removed stays removed.
+        cache = RepresentationCache(maxsize=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        def func(key, value):
+            if key == 'a':
+                self.assertEqual(2, cache.get('b'))
+                cache.set('C', 30)
+                cache.set('B', 200)
+            return key.upper(), value * 10
+
+        cache.rekey(func)
+        self.assertEqual(['A', 'C', 'B'], cache.keys())
+        self.assertEqual(200, cache.get('B'))
+
+        # And nothing changes if it's out of date by the time it's done
+        cache.rekey(lambda key, value: None, is_current=lambda: False)
+        self.assertEqual(['A', 'C', 'B'], cache.keys())
+
+    def test_per_instance(self):
+        printi_1 = Printi()
+        printi_2 = Printi()
+        printi_1.find_representation(pi)
+        printi_1.find_representation(e)
+        printi_2.find_representation(pi)
+
+        self.assertEqual(2, printi_1.find_representation.cache_info().currsize)
+        self.assertEqual(1, printi_2.find_representation.cache_info().currsize)
+
+        # Updating one instance doesn't touch the other
+        printi_1.update_config(cache_size=1, cache_policy='lfu')
+        self.assertEqual(0, printi_1.find_representation.cache_info().currsize)
+        self.assertEqual(1, printi_1.find_representation.cache_info().maxsize)
+        self.assertEqual(1, printi_2.find_representation.cache_info().currsize)
+
+        printi_1.find_representation(pi)
+        printi_1.find_representation(e)
+        self.assertEqual(1, printi_1.find_representation.cache_info().evictions)
+
+    def test_bad_update(self):
+        local_printi = Printi()
+        self.assertEqual('π', local_printi.find_representation(pi))
+
+        # A rejected update leaves the config (and the cache) as it was
+        for config in ({'cache_policy': 'mru'}, {'cache_policy': 'ttl'}, {'cache_policy': 'ttl', 'symbol': '*'}):
+            with self.subTest(config), self.assertRaises(ValueError):
+                local_printi.update_config(**config)
+
+        self.assertEqual('lru', local_printi._conf.cache_policy)
+        self.assertEqual('💡', local_printi._conf.symbol)
+        self.assertEqual('π', local_printi.find_representation(pi))
+        self.assertEqual(1, local_printi.find_representation.cache_info().hits)
+        self.assertEqual('e', local_printi.find_representation(e))
+
+    def test_generation(self):
+        local_printi = Printi()
+
+        # A search that finishes after the config has changed isn't cached
+        def find_fraction_then_update(num, conf):
+            local_printi.update_config(max_denominator=50)
+            return 'stale'
+
+        local_printi._find_fraction = find_fraction_then_update
+        self.assertEqual('stale', local_printi.find_representation(0.3))
+        self.assertEqual(0, local_printi.find_representation.cache_info().currsize)
+
+    def test_config_updates(self):
+        # Results that are still right after a config update are kept, the
+        # rest are searched for again, and either way the result is the same as
+        # from a fresh instance with the same config
+        lam = 0.66274341934918158097
+        nums = [pi / 3, 1 - pi, 2 * e / 5, 0.75, 1.5, 3 * lam, 2 + lam / 5, 0.1234567, 83 * e ** 2 / 17, sqrt(2) / 9]
+        tests = [
+            ({'symbol': '*'}, len(nums)),
+            ({'log_location': 'batch'}, len(nums)),
+            ({'specials': {lam: 'λ'}}, len(nums) - 2),  # 32/4 and √2/9 matched a digit, so they're searched again
+            ({'specials': {pi: 'PI'}}, len(nums)),
+            ({'specials': {pi: None}}, len(nums) - 2),
+            ({'max_denominator': 10}, len(nums) - 1),  # 83e²/17, a last resort
+            ({'min_denominator': 5}, len(nums) - 1),  # 3/4
+            ({'tol': 1e-10}, 0),
+            ({'max_denominator': 200}, 0),
+        ]
+
+        for config, kept in tests:
+            with self.subTest(config):
+                local_printi = Printi()
+                fresh_printi = Printi()
+                fresh_printi.update_config(**config)
+
+                for num in nums:
+                    local_printi.find_representation(num)
+                local_printi.update_config(**config)
+                self.assertEqual(kept, local_printi.find_representation.cache_info().currsize)
+
+                for num in nums:
+                    self.assertEqual(str(fresh_printi.find_representation(num)), str(local_printi.find_representation(num)))
+
+        # Adding a special finds it for numbers that didn't match before
+        local_printi = Printi()
+        self.assertEqual('2 + 1/5', local_printi.find_representation(2.2))
+        self.assertIsNone(local_printi.find_representation(2 + lam / 5))
+        local_printi.update_config(specials={lam: 'λ'})
+        self.assertEqual(2, local_printi.find_representation.cache_info().currsize)
+        local_printi._search = None  # Nothing is searched from here on
+        self.assertEqual('2 + λ/5', local_printi.find_representation(2 + lam / 5))
+        self.assertEqual('2 + 1/5', local_printi.find_representation(2.2))
+
+        # The results of find_representations() get the new symbol
+        local_printi = Printi()
+        local_printi.find_representations(f'{pi / 3}')
+        local_printi.update_config(symbol='*')
+        local_printi._search = None
+        self.assertEqual(['* 1.0471975511965976 ≈ π/3'], local_printi.find_representations(f'{pi / 3}'))
+
+        # Ranked results are kept whether or not k was given
+        local_printi = Printi()
+        local_printi.rank_representations(pi / 3)
+        local_printi.rank_representations(pi / 3, 1)
+        local_printi.update_config(symbol='*')
+        self.assertEqual(2, local_printi.rank_representations.cache_info().currsize)
+        self.assertEqual(['π/3', 'τ/6'], [str(rep) for rep in local_printi.rank_representations(pi / 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.printi.cli import annotate_chunk, main, read_chunks
+from src.printi.printi import Printi
+
+TEXT = (
+    b'loss 0.7853981633974483 step 2\n'
+    b'hello 1.0471975511965976 and 7.3890560989306495 and 1.0471975511965976\n'
+    b'no numbers\n'
+    b'-2.4674011002723395'
+)
+
+ANNOTATED = (
+    'loss 0.7853981633974483 step 2\n'
+    '💡 0.7853981633974483 ≈ π/4\n'
+    'hello 1.0471975511965976 and 7.3890560989306495 and 1.0471975511965976\n'
+    '💡 1.0471975511965976 ≈ π/3\n'
+    '💡 7.3890560989306495 ≈ e²\n'
+    'no numbers\n'
+    '-2.4674011002723395\n'
+    '💡 -2.4674011002723395 ≈ -π²/4\n'
+).encode()
+
+
+class TestCli(unittest.TestCase):
+    def test_read_chunks(self):
+        for chunk_size in (5, 10, 100):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(read_chunks(io.BytesIO(TEXT), chunk_size))
+                self.assertEqual(TEXT, b''.join(chunk for _, chunk in chunks))
+
+                # Offsets line up, and no number is split
+                offset = 0
+                for chunk_offset, chunk in chunks:
+                    self.assertEqual(offset, chunk_offset)
+                    offset += len(chunk)
+
+                self.assertTrue(all(chunk.endswith(b'\n') for _, chunk in chunks[:-1]))
+
+        # A very long line is split, but not in a number
+        chunks = [chunk for _, chunk in read_chunks(io.BytesIO(b'x 0.78539816' * 10), 2)]
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(chunk.endswith((b'x', b' ')) for chunk in chunks[:-1]))
+
+    def test_annotate_chunk(self):
+        output, records = annotate_chunk(Printi(), TEXT, offset=100)
+        self.assertEqual(ANNOTATED, output)
+        self.assertEqual((105, '0.7853981633974483', 'π/4'), records[0])
+        self.assertEqual(5, len(records))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            in_path = os.path.join(tmp, 'in.txt')
+            report_path = os.path.join(tmp, 'report.jsonl')
+            with open(in_path, 'wb') as file:
+                file.write(TEXT * 3)
+
+            for jobs in ('1', '2'):
+                with self.subTest(jobs=jobs):
+                    stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+                    with patch('sys.stdout', stdout):
+                        main([in_path, '--chunk-size', '16', '--jobs', jobs, '--report', report_path])
+
+                    # The same as annotating it all in one go
+                    self.assertEqual(annotate_chunk(Printi(), TEXT * 3)[0], stdout.buffer.getvalue())
+
+                    with open(report_path, encoding='utf-8') as file:
+                        records = [json.loads(line) for line in file]
+
+                    self.assertEqual(15, len(records))
+                    self.assertEqual({
+                        'file': in_path,
+                        'offset': len(TEXT) + 5,
+                        'number': '0.7853981633974483',
+                        'representation': 'π/4',
+                    }, records[5])
+
+    def test_broken_pipe(self):
+        # Like `printi log.txt | head -1`, the reader stops early
+        with tempfile.TemporaryDirectory() as tmp:
+            in_path = os.path.join(tmp, 'in.txt')
+            with open(in_path, 'wb') as file:
+                file.write(TEXT * 20_000)
+
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'src.printi', in_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            self.assertEqual(ANNOTATED[:100], process.stdout.read(100))
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+
+            self.assertEqual(1, process.wait())
+            self.assertEqual(b'', stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
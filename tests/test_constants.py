@@ -0,0 +1,97 @@
+import math
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.printi.constants import PACKS, ConstantLibrary, ConstantTable, register_pack
+from src.printi.printi import Printi
+
+phi = (1 + math.sqrt(5)) / 2
+gamma = 0.5772156649015329
+
+
+class TestConstants(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = Path(temp_dir.name)
+
+        for patcher in (
+                patch.dict(os.environ, PRINTI_CACHE_DIR=str(self.cache_dir)),
+                patch.dict(ConstantLibrary._tables, clear=True),
+                patch.dict(PACKS),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_find_representation(self):
+        local_printi = Printi()
+        cases = {
+            phi: 'φ',
+            -phi / 3: '-φ/3',
+            3 + gamma / 2: '3 + γ/2',
+            2 - math.log(2): '2 - ln(2)',
+            5 * 1.2020569031595942 ** 2 / 7: '5ζ(3)²/7',
+            6.62607015e-34 / 2: 'h/2',
+            math.pi / 3: 'π/3',  # The specials come first
+        }
+        self.assertIsNone(local_printi.find_representation(phi))
+
+        local_printi.update_config(constants=['math', 'physics'])
+        for num, expected in cases.items():
+            with self.subTest(num=num):
+                self.assertEqual(expected, local_printi.find_representation(num))
+                self.assertEqual(expected, local_printi.rank_representations(num)[0])
+
+        self.assertIsNone(local_printi.find_representation(0.1234567))
+
+        # No number is an integer away from a big constant like N_A
+        self.assertIsNone(local_printi.find_representation(1.000000000123))
+
+        # An unknown pack is rejected straight away, and the config is left as it was
+        with self.assertRaises(ValueError):
+            local_printi.update_config(constants=['math', 'nope'])
+        self.assertEqual(['math', 'physics'], local_printi._conf.constants)
+        self.assertEqual('φ', local_printi.find_representation(phi))
+
+    def test_table(self):
+        table = ConstantTable(PACKS['math'])
+        self.assertEqual([table.path], list(self.cache_dir.iterdir()))
+
+        # After that, it's loaded from the file, not built again
+        with patch.object(ConstantTable, '_build') as build:
+            loaded = ConstantTable(PACKS['math'])
+            build.assert_not_called()
+        self.assertEqual(list(table.values), list(loaded.values))
+        self.assertEqual(sorted(table.values), list(table.values))
+
+        # A table that's been cut short is built again
+        data = table.path.read_bytes()
+        table.path.unlink()  # Rather than truncate the file that's mapped
+        table.path.write_bytes(data[:100])
+        self.assertEqual(list(table.values), list(ConstantTable(PACKS['math']).values))
+
+        # If there's nowhere to save it, it's kept in memory
+        cache_file = self.cache_dir / 'file'
+        cache_file.touch()
+        in_memory = ConstantTable(PACKS['math'], cache_dir=cache_file / 'printi')
+        self.assertEqual(list(table.values), list(in_memory.values))
+
+    def test_register_pack(self):
+        local_printi = Printi()
+        local_printi.update_config(constants=['math'])
+        self.assertEqual('φ', local_printi.find_representation(phi))
+        self.assertEqual(1, len(list(self.cache_dir.iterdir())))
+
+        # Only the new pack's table is built
+        register_pack('mine', {1.2345678: 'λ'})
+        local_printi.update_config(constants=['math', 'mine'])
+        self.assertEqual('2 + λ/3', local_printi.find_representation(2 + 1.2345678 / 3))
+        self.assertEqual('φ', local_printi.find_representation(phi))
+        self.assertEqual(2, len(list(self.cache_dir.iterdir())))
+
+
+if __name__ == '__main__':
+    unittest.main()
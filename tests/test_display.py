@@ -0,0 +1,136 @@
+import io
+import sys
+import unittest
+from math import pi, e, sqrt
+from unittest.mock import patch
+
+from src.printi.printi import Printi
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from IPython.core.interactiveshell import InteractiveShell
+except ImportError:
+    InteractiveShell = None
+
+
+class TestDisplay(unittest.TestCase):
+    def setUp(self):
+        self.displayhook = sys.displayhook
+        self.stdout = io.StringIO()
+        patcher = patch('sys.stdout', self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def display(self, local_printi, value) -> str:
+        # What's written when the REPL shows value
+        if local_printi._display_hook is None:
+            local_printi.watch(display=True)
+            self.addCleanup(local_printi.unwatch)
+
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        sys.displayhook(value)
+        return self.stdout.getvalue()
+
+    def test_displayhook(self):
+        local_printi = Printi()
+
+        self.assertEqual(
+            '1.0471975511965976\n💡 1.0471975511965976 ≈ π/3\n',
+            self.display(local_printi, pi / 3),
+        )
+        self.assertIsNot(self.displayhook, sys.displayhook)
+
+        # The text isn't searched, the numbers in the object are
+        with patch.object(local_printi, 'find_representations') as find:
+            output = self.display(local_printi, [e ** 2, (1 + pi / 4 * 1j), {'a': sqrt(2), 'b': 'text'}])
+            find.assert_not_called()
+
+        self.assertEqual(
+            "[7.3890560989306495, (1+0.7853981633974483j), {'a': 1.4142135623730951, 'b': 'text'}]\n"
+            '💡 7.3890560989306495 ≈ e²\n'
+            '💡 0.7853981633974483 ≈ π/4\n'
+            '💡 1.4142135623730951 ≈ √2\n',
+            output,
+        )
+
+        self.assertEqual('', self.display(local_printi, None))
+
+        # Only numbers that would be searched in text, so not NaN, inf or 0.5
+        self.assertEqual('inf\n', self.display(local_printi, float('inf')))
+        values = [0.5, float('nan'), complex(-float('inf'), 1)]
+        self.assertEqual('[0.5, nan, (-inf+1j)]\n', self.display(local_printi, values))
+
+        local_printi.unwatch()
+        self.assertIs(self.displayhook, sys.displayhook)
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_arrays(self):
+        local_printi = Printi()
+        values = np.array([[pi / 3, 0.5], [0.1234, np.nan], [pi / 3, np.inf]])
+
+        # All the values are searched at full precision, not as NumPy prints them
+        output = self.display(local_printi, values)
+        self.assertEqual(
+            ['💡 1.0471975511965976 ≈ π/3'],
+            output.splitlines()[3:],
+        )
+
+        # Showing it again doesn't search it again, unless it's changed
+        with patch.object(local_printi, 'find_representations_batch', wraps=local_printi.find_representations_batch) as find:
+            self.assertEqual(output, self.display(local_printi, values))
+            find.assert_not_called()
+
+            values[1, 0] = e ** 2
+            self.assertIn('💡 7.3890560989306495 ≈ e²', self.display(local_printi, values))
+            find.assert_called_once()
+
+        # Scalars too
+        self.assertEqual(
+            'np.float64(7.3890560989306495)\n💡 7.3890560989306495 ≈ e²\n',
+            self.display(local_printi, np.float64(e ** 2)),
+        )
+
+    def test_cache(self):
+        local_printi = Printi()
+        values = [pi / 3, [e ** 2]]
+        with patch.object(local_printi, 'find_representation', wraps=local_printi.find_representation) as find:
+            self.display(local_printi, values)
+            self.assertEqual(2, find.call_count)
+
+            self.display(local_printi, values)
+            self.assertEqual(2, find.call_count)
+
+            # Changing a nested list counts as a change
+            values[1].append(sqrt(2))
+            self.assertIn('💡 1.4142135623730951 ≈ √2', self.display(local_printi, values))
+            self.assertEqual(5, find.call_count)
+
+    @unittest.skipIf(InteractiveShell is None, 'IPython is not installed')
+    def test_ipython(self):
+        local_printi = Printi()
+        shell = InteractiveShell.instance()
+        self.addCleanup(InteractiveShell.clear_instance)
+
+        local_printi.watch(display=True)
+        with patch.object(local_printi, 'find_representations', wraps=local_printi.find_representations) as find:
+            shell.run_cell(f'{pi / 3} + 0')
+            find.assert_not_called()
+
+        shell.run_cell(f'print({pi / 4})')
+        local_printi.unwatch()
+
+        self.assertIn(
+            'Out[1]: 1.0471975511965976\n💡 1.0471975511965976 ≈ π/3\n'
+            '0.7853981633974483\n💡 0.7853981633974483 ≈ π/4\n',
+            self.stdout.getvalue(),
+        )
+        self.assertNotIn('write_format_data', vars(shell.displayhook))
+
+
+if __name__ == '__main__':
+    unittest.main()
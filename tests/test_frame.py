@@ -0,0 +1,97 @@
+import math
+import random
+import unittest
+from math import pi, e
+
+import src.printi as printi_package
+from src.printi.printi import Printi
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+@unittest.skipIf(pd is None, 'pandas is not installed')
+class TestFrame(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                'a': [pi / 3, 0.1234, 0.75, math.nan],
+                'b': [e ** 2, random.random(), pi / 3, 0.25],
+                'n': [1, 2, 3, 4],
+                's': ['π', 'is', 'not', 'here'],
+            },
+            index=['w', 'x', 'y', 'z'],
+        )
+
+    def test_annotate_frame(self):
+        local_printi = Printi()
+        result = local_printi.annotate_frame(self.df)
+
+        # Only the float columns, with the same index
+        self.assertEqual(['a', 'b'], list(result.columns))
+        self.assertEqual(['w', 'x', 'y', 'z'], list(result.index))
+        self.assertEqual(['π/3', None, '3/4', None], [None if rep is None else str(rep) for rep in result['a']])
+        self.assertEqual(['e²', None, 'π/3', '1/4'], [None if rep is None else str(rep) for rep in result['b']])
+
+        # The same results as searching one at a time
+        for name in result:
+            for num, rep in zip(self.df[name], result[name]):
+                expected = local_printi.find_representation(num) if math.isfinite(num) else None
+                self.assertEqual(expected, rep)
+
+        # Other columns can be asked for, and nullable floats work too
+        self.df['f'] = pd.array([0.5, None, pi, 0.1234], dtype='Float64')
+        result = local_printi.annotate_frame(self.df, columns=['f', 'n'])
+        self.assertEqual(['1/2', None, 'π', None], [None if rep is None else str(rep) for rep in result['f']])
+        self.assertEqual([None] * 4, list(result['n']))
+
+    def test_package(self):
+        # The package's printi instance has it too
+        result = printi_package.annotate_frame(self.df, columns=['b'])
+        self.assertEqual('e²', str(result['b']['w']))
+
+    def test_distinct_values(self):
+        # Each distinct value is searched once, whichever column it's in
+        local_printi = Printi()
+        searched = []
+        find_representations_batch = local_printi.find_representations_batch
+        local_printi.find_representations_batch = lambda nums: searched.extend(nums) or find_representations_batch(nums)
+
+        local_printi.annotate_frame(self.df)
+        self.assertEqual(7, len(searched))  # pi / 3 is in both columns
+
+    def test_style(self):
+        try:
+            import jinja2
+        except ImportError:
+            self.skipTest('jinja2 is not installed')
+
+        html = Printi().annotate_frame(self.df, style=True).to_html()
+        self.assertIn('1.0471975511965976 ≈ π/3', html)
+        self.assertIn('0.1234<', html)
+
+    @unittest.skipIf(pa is None, 'PyArrow is not installed')
+    def test_arrow(self):
+        local_printi = Printi()
+        table = pa.table({
+            'a': pa.chunked_array([[pi / 3, None], [0.75]]),
+            'n': pa.array([1, 2, 3]),
+        })
+
+        result = local_printi.annotate_frame(table)
+        self.assertEqual(['a'], result.column_names)
+        self.assertEqual(['π/3', None, '3/4'], result.column('a').to_pylist())
+
+        with self.assertRaises(ValueError):
+            local_printi.annotate_frame(table, style=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
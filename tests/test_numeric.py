@@ -0,0 +1,27 @@
+import random
+import unittest
+from fractions import Fraction as F
+
+from src.printi.numeric import limit_denominator
+
+
+class TestNumeric(unittest.TestCase):
+    def test_limit_denominator(self):
+        rng = random.Random(0)
+        nums = [0.0, -0.0, 0.5, -2.5, 1 / 3, 22 / 7, 1e-300, 1e300, 0.49999999999999994]
+        nums += [rng.random() * 10 ** rng.randint(-8, 8) * rng.choice([1, -1]) for _ in range(2000)]
+        nums += [rng.randint(1, 500) / rng.randint(1, 500) for _ in range(2000)]
+
+        for num in nums:
+            for max_denominator in (1, 7, 100, 1000000):
+                with self.subTest(num=num, max_denominator=max_denominator):
+                    frac = F(num).limit_denominator(max_denominator)
+                    expected = frac.numerator, frac.denominator
+                    self.assertEqual(expected, limit_denominator(num, max_denominator))
+
+                    # With a cutoff, it's the same, unless the denominator is too big
+                    for cutoff in (2, 100):
+                        self.assertEqual(
+                            None if frac.denominator > cutoff else expected,
+                            limit_denominator(num, max_denominator, cutoff),
+                        )
@@ -0,0 +1,33 @@
+import random
+import unittest
+from math import pi, e
+
+from src.printi.printi import Printi
+
+
+class TestParallel(unittest.TestCase):
+    def test_find_representations_parallel(self):
+        nums = [pi / 3, e ** 2, 0.1, 1.0000001] + [random.random() for _ in range(300)] + [pi / 3]
+
+        local_printi = Printi()
+        local_printi.update_config(specials={0.66274341934918158097: 'λ'}, max_denominator=50)
+        results = local_printi.find_representations_parallel(nums, max_workers=2)
+
+        # The same as searching one at a time, in the same order
+        serial_printi = Printi()
+        serial_printi.update_config(specials={0.66274341934918158097: 'λ'}, max_denominator=50)
+        self.assertEqual([serial_printi.find_representation(num) for num in nums], results)
+        self.assertEqual(['π/3', 'e²', '1/10', None], results[:4])
+
+        # And the results are now cached
+        hits = local_printi.find_representation.cache_info().hits
+        self.assertEqual('π/3', local_printi.find_representation(pi / 3))
+        self.assertEqual(hits + 1, local_printi.find_representation.cache_info().hits)
+
+        # With nothing left to search, no pool is needed
+        self.assertEqual(['π/3', 'e²'], local_printi.find_representations_parallel([pi / 3, e ** 2], max_workers=2))
+        self.assertEqual([], local_printi.find_representations_parallel([], max_workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,23 @@
+import asyncio
+import io
 import math
 import random
+import subprocess
+import sys
+import threading
 import unittest
+from array import array
 from fractions import Fraction as F
 from math import pi, e, tau
 from unittest.mock import patch, call
 
 from src.printi import printi
+from src.printi.printi import CandidateIndex, Printi
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class TestPrinti(unittest.TestCase):
@@ -44,6 +56,194 @@ class TestPrinti(unittest.TestCase):
 
             printi.unwatch()
 
+    def test_printi_watch_background(self):
+        local_printi = Printi()
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            local_printi.watch(background=True)
+            try:
+                print(f'The number is {math.e ** 2}!')
+
+                # The text is written straight away, the result comes from the worker
+                self.assertIn('The number is 7.3890560989306495!\n', stdout.getvalue())
+            finally:
+                # Stopping waits for the pending results
+                local_printi.unwatch()
+
+        self.assertIn('💡 7.3890560989306495 ≈ e²\n', stdout.getvalue())
+
+    def test_printi_watch_background_async(self):
+        # Inside an event loop, the search still goes to the worker, so stopping waits for it
+        local_printi = Printi()
+
+        async def main():
+            local_printi.watch(background=True)
+            print(f'The number is {pi / 3}!')
+            local_printi.unwatch()
+
+            # And a batch() block waits for it too
+            local_printi.watch(background=True)
+            with local_printi.batch():
+                print(f'The number is {e ** 2}!')
+            self.assertIn('💡 7.3890560989306495 ≈ e²\n', sys.stdout.getvalue())
+            local_printi.unwatch()
+
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            asyncio.run(main())
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(['The number is 1.0471975511965976!', '💡 1.0471975511965976 ≈ π/3'], lines[1:3])
+        self.assertTrue(lines[3].startswith('Printi is no longer watching'))
+
+    def test_log_location(self):
+        local_printi = Printi()
+        with patch('sys.stdout.write') as mock_write:
+            # line_end only makes sense when watching, so the results go before print's '\n'
+            local_printi.update_config(log_location='line_end')
+            local_printi.watch()
+            mock_write.reset_mock()
+            print(f'{pi / 3} and {e ** 2}')
+            mock_write.assert_has_calls([
+                call('1.0471975511965976 and 7.3890560989306495'),
+                call('  💡 1.0471975511965976 ≈ π/3  💡 7.3890560989306495 ≈ e²'),
+                call('\n'),
+            ])
+            local_printi.unwatch()
+
+    def test_batch(self):
+        local_printi = Printi()
+        with patch('sys.stdout.write') as mock_write:
+            local_printi.watch()
+            mock_write.reset_mock()
+
+            with local_printi.batch():
+                for i in range(3):
+                    print(f'{i} {pi / 3} and {e ** 2}')
+
+            # The results are written once, at the end, without duplicates
+            mock_write.assert_has_calls([
+                call('2 1.0471975511965976 and 7.3890560989306495'),
+                call('\n'),
+                call('💡 1.0471975511965976 ≈ π/3\n💡 7.3890560989306495 ≈ e²\n'),
+            ])
+            self.assertEqual(mock_write.call_count, 7)
+
+            # Outside a block, results are held until there are batch_size of them
+            local_printi.update_config(log_location='batch', batch_size=2, batch_interval=None)
+            mock_write.reset_mock()
+            print(pi / 3)
+            self.assertEqual(mock_write.call_count, 2)
+            print(e ** 2)
+            mock_write.assert_called_with('💡 1.0471975511965976 ≈ π/3\n💡 7.3890560989306495 ≈ e²\n')
+
+            # And unwatch() writes whatever is left
+            print(pi / 3)
+            mock_write.reset_mock()
+            local_printi.unwatch()
+            mock_write.assert_has_calls([call('💡 1.0471975511965976 ≈ π/3\n')])
+
+    def test_batch_interval(self):
+        local_printi = Printi()
+        local_printi.update_config(log_location='batch', batch_interval=60)
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            local_printi.watch()
+            try:
+                print(pi / 3)
+                print('Part of a line', end='')
+                timer = local_printi._sink._timer
+                timer.cancel()
+
+                # When the interval is up, the results wait for the end of the line
+                timer.function()
+                self.assertNotIn('π/3', stdout.getvalue())
+                print(', and the rest')
+                self.assertTrue(stdout.getvalue().endswith(
+                    '1.0471975511965976\nPart of a line, and the rest\n💡 1.0471975511965976 ≈ π/3\n'
+                ))
+
+                # With no line part written, they're written straight away
+                print(e ** 2)
+                timer = local_printi._sink._timer
+                timer.cancel()
+                timer.function()
+                self.assertTrue(stdout.getvalue().endswith('7.3890560989306495\n💡 7.3890560989306495 ≈ e²\n'))
+            finally:
+                local_printi.unwatch()
+
+    def test_stats(self):
+        local_printi = Printi()
+        with patch('sys.stdout.write'):
+            # Nothing is collected until it's turned on
+            local_printi(f'{pi / 3}')
+            self.assertEqual({}, local_printi.stats()['counters'])
+
+            local_printi.update_config(instrument=True)
+            local_printi(f'{pi / 3} {0.1234567} {1 / 3} {1 - pi} {random.random()} {pi / 3}')
+
+        stats = local_printi.stats()
+        self.assertEqual(6, stats['counters']['numbers'])
+        self.assertEqual(1, stats['counters']['match.direct'])
+        self.assertEqual(1, stats['counters']['match.fraction'])
+        self.assertEqual(1, stats['counters']['match.sub'])
+        self.assertEqual(2, stats['counters']['match.none'])
+        self.assertEqual(6, stats['counters']['writes'])  # '\n' and the result, for 3 results
+        self.assertGreater(stats['counters']['candidates'], 0)
+        self.assertEqual(1, stats['timings']['scan']['count'])
+        self.assertEqual(4, stats['timings']['search']['count'])
+        self.assertEqual(1, stats['cache']['hits'])  # The second π/3
+
+        local_printi.reset_stats()
+        self.assertEqual({}, local_printi.stats()['counters'])
+
+    def test_threads(self):
+        local_printi = Printi()
+        stop = threading.Event()
+        results = []
+
+        def search():
+            while not stop.is_set():
+                results.append(local_printi.find_representation(pi / 7))
+
+        def update():
+            for i in range(200):
+                # π/7 is π/7 or τ/14, but never some mix of the two configs
+                local_printi.update_config(specials={pi: None if i % 2 else 'π', tau: 'τ'})
+                local_printi.update_config(symbol='*' if i % 2 else '💡', specials={pi: 'π'})
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        update()
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual({str(rep) for rep in results}, {'π/7', 'τ/14'})
+
+        # Watching from two threads at once only wraps stdout once
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            threads = [threading.Thread(target=local_printi.watch) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertIs(stdout, sys.stdout.stream)
+            local_printi.unwatch()
+            self.assertIs(stdout, sys.stdout)
+
+    def test_lazy_imports(self):
+        # Importing and watching shouldn't load the search machinery until a number is printed
+        code = '\n'.join([
+            'import sys',
+            'import src.printi as printi',
+            'printi.watch()',
+            'print("Nothing to see here")',
+            'printi.unwatch()',
+            'print(sorted({"fractions", "json", "re", "sqlite3", "dataclasses"} & set(sys.modules)))',
+        ])
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual('[]', result.stdout.splitlines()[-1])
+
     def test_printi_no_op(self):
         with patch('sys.stdout.write') as mock_write:
             printi('This text contains nothing special')
@@ -184,10 +384,36 @@ class TestPrinti(unittest.TestCase):
 
         for test in tests:
             with self.subTest(msg=f'{test[0]} => {test[1]}'):
-                self.assertEqual(test[1], printi.find_representation(test[0]))
+                rep = printi.find_representation(test[0])
+                self.assertEqual(test[1], rep)
+
+                # The ASCII form is valid Python, and should give back the number
+                if rep is not None:
+                    value = eval(rep.render('ascii'), vars(math))
+                    self.assertTrue(math.isclose(test[0], value, rel_tol=1e-6))
 
-        # TODO (@davidgilbertson): I should take the response, replace some characters,
-        #  eval() it and check it's right
+    def test_find_representations_units(self):
+        local_printi = Printi()
+        tests = [
+            (f'{complex(pi / 4, -pi / 4)}', ['💡 0.7853981633974483-0.7853981633974483j ≈ π/4 - (π/4)j']),
+            (f'{complex(0.5, 3 * pi)}', ['💡 9.42477796076938j ≈ 3πj']),
+            (f'{complex(-pi / 3, 0)}', ['💡 -1.0471975511965976 ≈ -π/3']),
+            (f'{(pi / 3, 0.5, -pi / 3)}', ['💡 (1.0471975511965976, 0.5, -1.0471975511965976) ≈ (π/3, 0.5, -π/3)']),
+            # Rounded by NumPy, so it's within tol of τ/8, which comes first
+            ('[0.78539816 1.23456789]', ['💡 [0.78539816 1.23456789] ≈ [τ/8 1.23456789]']),
+            (f'{[complex(pi / 3, -pi / 4), 0.5]}', ['💡 1.0471975511965976-0.7853981633974483j ≈ π/3 - (π/4)j']),  # Nested, so just the complex number
+            (f'x = {pi}, y = {-pi}', ['💡 3.141592653589793 ≈ π', '💡 -3.141592653589793 ≈ -π']),
+            (f'{(0.1234567, 0.9182736)}', []),
+        ]
+
+        for text, expected in tests:
+            with self.subTest(text):
+                self.assertEqual(expected, local_printi.find_representations(text))
+
+        # A value and its negative are only searched once
+        local_printi.find_representation.cache_clear()
+        local_printi.find_representations(f'{complex(pi / 7, -pi / 7)}')
+        self.assertEqual(1, local_printi.find_representation.cache_info().misses)
 
     def test_specials(self):
         printi.find_representation.cache_clear()
@@ -211,6 +437,87 @@ class TestPrinti(unittest.TestCase):
         printi.update_config(specials={0.66274341934918158097: 'λ'})
         self.assertEqual('λ', printi.find_representation(0.662743419349181))
 
+    def test_candidate_index(self):
+        index = CandidateIndex.build({pi: 'π', e: 'e'})
+
+        # Every sorted entry points back to the candidate it came from
+        self.assertEqual(len(index.tests), len(index.candidates))
+        for test, position in zip(index.tests, index.positions):
+            self.assertEqual(test, index.candidates[position][0])
+
+        # π/2 is also 2π/4, the first one in search order wins
+        position = index.find_close(pi / 2, tol=1e-9)
+        self.assertEqual((1, 2), index.candidates[position][2:4])
+        self.assertIsNone(index.find_close(0.10294784944315827, tol=1e-9))
+
+        # The index is rebuilt when the specials change
+        local_printi = Printi()
+        self.assertEqual('π', local_printi.find_representation(pi))
+        local_printi.update_config(specials={0.66274341934918158097: 'λ'})
+        self.assertIsNone(local_printi._index)
+        self.assertEqual('λ/2', local_printi.find_representation(0.662743419349181 / 2))
+
+    def test_rank_representations(self):
+        local_printi = Printi()
+        tests = [
+            (math.sqrt(2) / 2, ['√2/2', '1/√2']),
+            (math.sqrt(8), ['2√2', '4/√2']),
+            (pi / 3, ['π/3', 'τ/6']),
+            (1 - pi, ['1 - π', '1 - τ/2']),
+            (2.3333333333333335, ['2 + 1/3']),
+            (8 * pi ** 3, ['τ³', '8π³']),
+            (83 * e ** 2 / 17, ['83e²/17']),
+            (0.75, ['3/4']),
+            (3.0, []),
+        ]
+
+        for num, expected in tests:
+            with self.subTest(num=num):
+                ranked = local_printi.rank_representations(num, 3)
+                self.assertEqual(expected, [str(rep) for rep in ranked])
+
+                # Stopping early gives the same top k as looking at everything
+                self.assertEqual(ranked[:1], local_printi.rank_representations(num, 1))
+                self.assertEqual(ranked, local_printi.rank_representations(num, 1000)[:3])
+
+        # In 'best' mode, the top ranked match is the one shown
+        self.assertEqual('1/√2', local_printi.find_representation(math.sqrt(2) / 2))
+        local_printi.update_config(match='best')
+        self.assertEqual('√2/2', local_printi.find_representation(math.sqrt(2) / 2))
+        self.assertEqual('τ³', local_printi.find_representation(8 * pi ** 3))
+        self.assertIsNone(local_printi.find_representation(0.10294784944315827))
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_find_representations_batch(self):
+        local_printi = Printi()
+        nums = [
+            pi / 3, -2 * pi / 3 - 12, 7.905604897606805, 1 / 3, 36.075979777132,
+            math.sqrt(5) / 2, 0.6523876388301708, 0.10294784944315827,
+            1.0000001, math.inf, math.nan, pi / 3,
+        ]
+        # Mix in plenty of values with no representation
+        nums += [random.random() for _ in range(500)]
+
+        results = local_printi.find_representations_batch(np.array(nums).reshape(-1, 2))
+        self.assertEqual((len(nums) // 2, 2), results.shape)
+
+        for num, result in zip(nums, results.ravel()):
+            with self.subTest(msg=f'{num} => {result}'):
+                expected = local_printi.find_representation(num) if math.isfinite(num) else None
+                self.assertEqual(expected, result)
+
+        # Anything with the buffer protocol works
+        self.assertEqual(
+            ['π/3', '1/2'],
+            list(local_printi.find_representations_batch(array('d', [pi / 3, 0.5]))),
+        )
+
+        local_printi.update_config(match='best')
+        self.assertEqual(
+            ['√2/2', None],
+            list(local_printi.find_representations_batch([math.sqrt(2) / 2, 3.0])),
+        )
+
     def test_false_positives(self):
         # Random troublemakers...
         self.assertEqual(None, printi.find_representation(0.10294784944315827))
@@ -0,0 +1,88 @@
+import math
+import os
+import random
+import tempfile
+import unittest
+from math import pi, e, tau, sqrt
+
+from src.printi.printi import Printi
+from src.printi.relation import Combination, RelationSearch, pslq
+
+
+class TestRelation(unittest.TestCase):
+    def test_pslq(self):
+        # 3 * x - 2 * π - 1 = 0
+        relation = pslq([(2 * pi + 1) / 3, 1.0, pi], max_coeff=20)
+        self.assertIn(relation, ([3, -1, -2], [-3, 1, 2]))
+        self.assertIsNone(pslq([0.123456789, 1.0, pi], max_coeff=20))
+
+    def test_relation_search(self):
+        local_printi = Printi()
+        search = RelationSearch()
+
+        # τ is 2π, τ² is 4π² and ln(e) is 1, so they're left out
+        basis = [element[1] for element in search.get_basis(local_printi._conf.specials)]
+        self.assertIn('π', basis)
+        self.assertNotIn('τ', basis)
+        self.assertNotIn('τ²', basis)
+        self.assertNotIn('ln(e)', basis)
+
+        tests = [
+            (pi + e, 'π + e', 'pi + e', r'\pi + e'),
+            (2 * sqrt(3) - pi / 4, '2√3 - π/4', '2*sqrt(3) - pi/4', r'2\sqrt{3} - \frac{\pi}{4}'),
+            (e ** 2 - pi, 'e² - π', 'e**2 - pi', r'e^{2} - \pi'),
+            (1 + pi ** 2 / 6, '1 + π²/6', '1 + pi**2/6', r'1 + \frac{\pi^{2}}{6}'),
+            (3 * math.log(2) / 7, '3ln(2)/7', '3*log(2)/7', r'\frac{3\ln{2}}{7}'),
+        ]
+
+        for num, unicode, ascii, latex in tests:
+            with self.subTest(unicode):
+                rep = search(num, local_printi._conf)
+                self.assertIsInstance(rep, Combination)
+                self.assertEqual(unicode, rep)
+                self.assertEqual(ascii, rep.render('ascii'))
+                self.assertEqual(latex, rep.render('latex'))
+                self.assertTrue(math.isclose(num, eval(ascii, vars(math)), rel_tol=1e-12))
+                self.assertEqual(rep, Combination.from_dict(rep.to_dict()))
+                self.assertTrue(math.isclose(-num, (-rep).value, rel_tol=1e-12))
+
+        # Random numbers shouldn't turn into anything
+        rng = random.Random(0)
+        for _ in range(50):
+            num = rng.random() * 10
+            self.assertIsNone(search(num, local_printi._conf), num)
+
+        # It only tries so many groups of constants, whatever the machine's doing
+        # (π, e) comes after each constant on its own, then (π, π²), (π, √π), ...
+        groups_before = len(basis) + basis.index('e') - 1
+        self.assertIsNone(RelationSearch(max_groups=0)(pi + e, local_printi._conf))
+        self.assertIsNone(RelationSearch(max_groups=groups_before)(pi + e, local_printi._conf))
+        self.assertEqual('π + e', RelationSearch(max_groups=groups_before + 1)(pi + e, local_printi._conf))
+
+    def test_backends(self):
+        local_printi = Printi()
+        self.assertIsNone(local_printi.find_representation(pi + e))
+
+        local_printi.update_config(backends=[RelationSearch()], instrument=True)
+        self.assertEqual('π + e', local_printi.find_representation(pi + e))
+        self.assertEqual(1, local_printi.stats()['counters']['match.relation'])
+
+        # Only used if nothing else matches, or for integers
+        self.assertEqual('2π/3', local_printi.find_representation(tau / 3))
+        self.assertIsNone(local_printi.find_representation(3.0))
+
+        local_printi.update_config(match='best')
+        self.assertEqual('π + e', local_printi.find_representation(pi + e))
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            path = os.path.join(dir_name, 'printi.sqlite')
+            local_printi.update_config(cache_path=path)
+            self.assertEqual('π + e', local_printi.find_representation(pi + e))
+
+            # A fresh instance gets it from disk without searching
+            printi_2 = Printi()
+            printi_2.update_config(cache_path=path, match='best', backends=[RelationSearch()])
+            printi_2._search = None
+            self.assertEqual('π + e', printi_2.find_representation(pi + e))
+            local_printi._store.close()
+            printi_2._store.close()
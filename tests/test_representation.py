@@ -0,0 +1,79 @@
+import math
+import pickle
+import unittest
+from fractions import Fraction as F
+from math import pi, e, tau
+
+from src.printi.printi import Printi
+from src.printi.representation import Representation
+
+
+class TestRepresentation(unittest.TestCase):
+    def test_render(self):
+        tests = [
+            # value, unicode, ascii, latex
+            (2 * pi / 3, '2π/3', '2*pi/3', r'\frac{2\pi}{3}'),
+            (pi ** 2, 'π²', 'pi**2', r'\pi^{2}'),
+            (0.5641895835477563, '1/√π', '1/sqrt(pi)', r'\frac{1}{\sqrt{\pi}}'),
+            (0.3989422804014327, '1/√τ', '1/sqrt(tau)', r'\frac{1}{\sqrt{\tau}}'),
+            (math.sqrt(5) / 2, '√5/2', 'sqrt(5)/2', r'\frac{\sqrt{5}}{2}'),
+            (7.905604897606805, '10 - 2π/3', '10 - 2*pi/3', r'10 - \frac{2\pi}{3}'),
+            (-36.075979777132, '-83e²/17', '-83*e**2/17', r'-\frac{83e^{2}}{17}'),
+            (22 / 7, '3 + 1/7', '3 + 1/7', r'3 + \frac{1}{7}'),
+            (-0.75, '-3/4', '-3/4', r'-\frac{3}{4}'),
+        ]
+
+        local_printi = Printi()
+        local_printi.update_config(specials={tau: 'τ'})
+        for value, unicode, ascii, latex in tests:
+            with self.subTest(unicode):
+                rep = local_printi.find_representation(value)
+                self.assertIsInstance(rep, Representation)
+                self.assertEqual(unicode, str(rep))
+                self.assertEqual(ascii, rep.render('ascii'))
+                self.assertEqual(latex, rep.render('latex'))
+                self.assertTrue(math.isclose(value, rep.value, rel_tol=1e-9))
+
+    def test_compare(self):
+        local_printi = Printi()
+        rep = local_printi.find_representation(pi / 3)
+        self.assertEqual('direct', rep.kind)
+        self.assertEqual((pi, 'π', 0, 1, 1, 3, 1), rep.key())
+
+        # Equal to its text, and to the same match found some other way
+        self.assertEqual(rep, 'π/3')
+        self.assertEqual(rep, Representation(pi, name='π', div=3))
+        self.assertNotEqual(rep, Representation(pi, name='π', div=3, sign=-1))
+        self.assertEqual(hash(rep), hash('π/3'))
+
+        # The same match under another name is written differently, so it isn't equal
+        renamed = Representation(pi, name='PI', div=3)
+        self.assertNotEqual(rep, renamed)
+        self.assertEqual(renamed, 'PI/3')
+        self.assertEqual(hash(renamed), hash('PI/3'))
+
+        self.assertEqual('fraction', local_printi.find_representation(0.75).kind)
+        self.assertEqual('last_resort', local_printi.find_representation(83 * e ** 2 / 17).kind)
+        self.assertEqual('sub', local_printi.find_representation(1 - pi).kind)
+
+    def test_negate(self):
+        local_printi = Printi()
+        for num in (pi / 3, 1 - pi, 3 * pi, 0.75, 2 + e / 3, 5 - math.sqrt(2), 83 * e ** 2 / 17, -pi / 3, -3 * pi):
+            with self.subTest(num):
+                rep = local_printi.find_representation(num)
+                self.assertEqual(-num, (-rep).value)
+                self.assertEqual(rep, -(-rep))
+
+        self.assertEqual('-π/3', -local_printi.find_representation(pi / 3))
+        self.assertEqual('π - 1', -local_printi.find_representation(1 - pi))
+        self.assertEqual('-3/4', -local_printi.find_representation(0.75))
+
+    def test_serialize(self):
+        for rep in (
+                Representation(pi, name='π', add=2, mult=-3, power=F(1, 2), div=5, error=1e-17, kind='sub'),
+                Representation.fraction(F(7, 3)),
+        ):
+            with self.subTest(str(rep)):
+                self.assertEqual(rep, Representation.from_dict(rep.to_dict()))
+                self.assertEqual(rep.to_dict(), Representation.from_dict(rep.to_dict()).to_dict())
+                self.assertEqual(rep.to_dict(), pickle.loads(pickle.dumps(rep)).to_dict())
@@ -0,0 +1,62 @@
+import re
+import unittest
+
+from src.printi.scan import find_numbers, find_units
+
+
+class TestScan(unittest.TestCase):
+    def test_find_numbers(self):
+        tests = [
+            ('No numbers here', []),
+            ('Too short 1.234 and 1.23456', [(20, 27)]),
+            ('(-2.4674011002723395+0j)', [(1, 20)]),
+            ('x.12345.1234', [(2, 12)]),
+            ('1.2345.6789', [(0, 6)]),
+            ('--1.23456', [(1, 9)]),
+            ('.12345', []),
+        ]
+
+        for text, expected in tests:
+            with self.subTest(text=text):
+                self.assertEqual(expected, find_numbers(text))
+                # The same spans as the plain regex
+                self.assertEqual(expected, [m.span() for m in re.finditer(r'-?\d+\.\d{4,}', text)])
+                # And the same for bytes, without copying
+                data = text.encode()
+                self.assertEqual(expected, find_numbers(data))
+                self.assertEqual(expected, find_numbers(memoryview(data)))
+
+    def test_long_digit_runs(self):
+        # The plain regex is quadratic here
+        text = '1' * 100_000 + ' 0.78539816'
+        self.assertEqual([(100_001, 100_011)], find_numbers(text))
+
+    def test_find_units(self):
+        tests = [
+            ('x = 1.23456', [('number', '1.23456')]),
+            ('(0.70710678-0.70710678j)', [('complex', '0.70710678-0.70710678j')]),
+            ('1.23456+0.52359877j', [('complex', '1.23456+0.52359877j')]),
+            ('0.52359877j', [('complex', '0.52359877j')]),
+            ('(-2.4674011002723395+0j)', [('number', '-2.4674011002723395')]),
+            ('(1.04719755, 0.5, -1.04719755)', [('vector', '(1.04719755, 0.5, -1.04719755)')]),
+            ('[0.78539816 1.57079633]', [('vector', '[0.78539816 1.57079633]')]),
+            ('[1.23456+0.52359877j, 1.23456]', [('vector', '[1.23456+0.52359877j, 1.23456]')]),
+            ('f(1.23456) (1.23456]', [('number', '1.23456'), ('number', '1.23456')]),
+            ('(x, 1.23456) [1.23456, 2.34567', [('number', '1.23456'), ('number', '1.23456'), ('number', '2.34567')]),
+        ]
+
+        for text, expected in tests:
+            with self.subTest(text=text):
+                units = find_units(text, find_numbers(text))
+                self.assertEqual(expected, [(kind, text[start:end]) for kind, start, end, _ in units])
+                # Every number is in exactly one unit
+                self.assertEqual(find_numbers(text), [span for *_, spans in units for span in spans])
+
+    def test_find_units_linear(self):
+        # Lots of numbers that look like they might be in brackets, but aren't
+        text = '(' + ' 1.23456' * 20_000
+        self.assertEqual(20_000, len(find_units(text, find_numbers(text))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from math import pi
+from multiprocessing import Pool
+
+from src.printi.printi import Printi
+from src.printi.store import DiskStore
+
+
+def _find_in_process(args):
+    path, num = args
+    local_printi = Printi()
+    local_printi.update_config(cache_path=path)
+    return local_printi.find_representation(num)
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'printi.sqlite')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_store(self):
+        store = DiskStore(self.path)
+        self.assertEqual('missing', store.get('key', pi, 'missing'))
+
+        store.set('key', pi, 'π')
+        store.set('key', 0.1, None)
+        self.assertEqual('π', store.get('key', pi))
+        self.assertIsNone(store.get('key', 0.1, 'missing'))
+        self.assertEqual('missing', store.get('other key', pi, 'missing'))
+
+        # -0.0 and 0.0 are different bit patterns
+        self.assertNotEqual(DiskStore.num_key(0.0), DiskStore.num_key(-0.0))
+        store.close()
+
+    def test_warm_start(self):
+        printi_1 = Printi()
+        printi_1.update_config(cache_path=self.path)
+        self.assertEqual('π/3', printi_1.find_representation(pi / 3))
+
+        # A fresh instance (as in a new session) gets it from disk without searching
+        printi_2 = Printi()
+        printi_2.update_config(cache_path=self.path)
+        printi_2._search = None
+        self.assertEqual('π/3', printi_2.find_representation(pi / 3))
+
+        # But not if the config that affects the search is different
+        printi_2.update_config(specials={pi: None})
+        del printi_2._search
+        self.assertEqual('τ/6', printi_2.find_representation(pi / 3))
+
+        # Or if the specials are the same, but in a different order (π is now after τ)
+        printi_3 = Printi()
+        printi_3.update_config(specials={pi: None})
+        printi_3.update_config(specials={pi: 'π'}, cache_path=self.path)
+        self.assertEqual('τ/6', printi_3.find_representation(pi / 3))
+
+    def test_processes(self):
+        nums = [pi / 3, pi / 4, 0.1, 0.5] * 5
+        with Pool(4) as pool:
+            results = pool.map(_find_in_process, [(self.path, num) for num in nums])
+
+        self.assertEqual(['π/3', 'π/4', '1/10', '1/2'] * 5, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import io
+import sys
+import threading
+import unittest
+from math import pi, e
+from unittest.mock import patch
+
+import src.printi as printi_package
+from src.printi.printi import Printi
+
+
+class TestStream(unittest.TestCase):
+    def test_whole_lines(self):
+        local_printi = Printi()
+        output = io.StringIO()
+        stream = local_printi.wrap(output)
+
+        with patch.object(local_printi, 'find_representations', wraps=local_printi.find_representations) as find:
+            # A number split over two writes, with the line finished later
+            stream.write('The number is 1.04719')
+            stream.write('75511965976 and ')
+            stream.write(f'{e ** 2}\nNext line')
+
+            # Searched once, for the whole line
+            find.assert_called_once_with('The number is 1.0471975511965976 and 7.3890560989306495')
+
+            # Whatever's left is searched at the end
+            stream.finish()
+
+        self.assertEqual(
+            'The number is 1.0471975511965976 and 7.3890560989306495'
+            '\n💡 1.0471975511965976 ≈ π/3'
+            '\n💡 7.3890560989306495 ≈ e²'
+            '\nNext line',
+            output.getvalue(),
+        )
+
+    def test_carriage_return(self):
+        local_printi = Printi()
+        searched = []
+        local_printi._on_line = lambda line, stream: searched.append(line)
+        stream = local_printi.wrap(io.TextIOWrapper(io.BytesIO(), encoding='utf-8'))
+
+        # A progress bar redraws its line, only the last one is searched
+        for i in range(1000):
+            stream.write(f'\r{i / 10}%')
+        self.assertEqual(['99.9%'], stream._pending)
+        stream.write(f' done, {pi / 3}\n')
+
+        # A '\r\n' still ends the line, even split over two writes
+        stream.write(f'{e ** 2}\r')
+        stream.write('\n')
+
+        stream.buffer.write(b'1%\r2%\r')
+        stream.buffer.write(b'3%\n')
+
+        self.assertEqual(['99.9% done, 1.0471975511965976', '7.3890560989306495\r', '3%'], searched)
+
+    def test_threads(self):
+        local_printi = Printi()
+        searched = []
+        local_printi._on_line = lambda line, stream: searched.append(line)
+        stream = local_printi.wrap(io.StringIO())
+
+        # Two threads each write half a line, then the other half, interleaved
+        first_half = threading.Barrier(2)
+        second_half = threading.Barrier(2)
+
+        def write(name):
+            stream.write(f'{name} starts, ')
+            first_half.wait()
+            stream.write(f'{name} ends\n')
+            second_half.wait()
+
+        threads = [threading.Thread(target=write, args=(name,)) for name in ('A', 'B')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Each thread's line is searched whole
+        self.assertEqual(['A starts, A ends', 'B starts, B ends'], sorted(searched))
+
+    def test_print_to_watched_stream(self):
+        local_printi = Printi()
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            local_printi.watch()
+            try:
+                # Already watched, so it's not wrapped again
+                local_printi(pi / 3, file=sys.stdout)
+            finally:
+                local_printi.unwatch()
+
+        self.assertEqual(
+            ['1.0471975511965976', '💡 1.0471975511965976 ≈ π/3'],
+            stdout.getvalue().splitlines()[1:-1],
+        )
+
+    def test_wrap(self):
+        output = io.StringIO()
+        stream = printi_package.wrap(output)
+        stream.write(f'{e ** 2}\n')
+        self.assertEqual('7.3890560989306495\n💡 7.3890560989306495 ≈ e²\n', output.getvalue())
+
+    def test_watch_stderr(self):
+        local_printi = Printi()
+        stderr = io.StringIO()
+        with patch('sys.stderr', stderr), patch('sys.stdout', io.StringIO()):
+            local_printi.watch(streams=('stdout', 'stderr'))
+            print(f'Warning: {pi / 3}', file=sys.stderr)
+            local_printi.unwatch()
+
+            self.assertIs(stderr, sys.stderr)
+
+        self.assertEqual('Warning: 1.0471975511965976\n💡 1.0471975511965976 ≈ π/3\n', stderr.getvalue())
+
+    def test_buffer(self):
+        local_printi = Printi()
+        output = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        stream = local_printi.wrap(output)
+
+        stream.write('Text first, ')
+        stream.buffer.write(f'then bytes {pi / 3}'.encode())
+        stream.buffer.write(b'\nmore')
+        stream.flush()
+
+        self.assertEqual(
+            'Text first, then bytes 1.0471975511965976\n💡 1.0471975511965976 ≈ π/3\nmore'.encode(),
+            output.buffer.getvalue(),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
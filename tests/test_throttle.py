@@ -0,0 +1,86 @@
+import io
+import sys
+import unittest
+from math import pi
+from unittest.mock import patch
+
+from src.printi.printi import Printi
+
+
+class TestThrottle(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        patcher = patch('src.printi.throttle.monotonic_ns', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, local_printi, lines: list[str]) -> list[str]:
+        output = io.StringIO()
+        stream = local_printi.wrap(output)
+        for line in lines:
+            stream.write(f'{line}\n')
+        return [line for line in output.getvalue().splitlines() if line.startswith('💡')]
+
+    def test_off(self):
+        local_printi = Printi()
+        self.assertIsNone(local_printi._throttle)
+        self.assertEqual(3, len(self.search(local_printi, [f'{i} {pi / i}' for i in range(1, 4)])))
+        self.assertNotIn('throttle', local_printi.stats())
+
+    def test_sample_repeats(self):
+        local_printi = Printi()
+        local_printi.update_config(sample_repeats=2)
+
+        # Only the first two lines that differ just by their numbers are searched
+        results = self.search(local_printi, [f'step {i}: {pi / i}' for i in range(1, 6)] + [f'other {pi}'])
+        self.assertEqual(['💡 3.141592653589793 ≈ π', '💡 1.5707963267948966 ≈ π/2', '💡 3.141592653589793 ≈ π'], results)
+
+        # And two more the next second
+        self.now += 1_000_000_000
+        self.assertEqual(2, len(self.search(local_printi, [f'step {i}: {pi / i}' for i in range(3, 6)])))
+
+        throttle = local_printi.stats()['throttle']
+        self.assertEqual(9, throttle['lines'])
+        self.assertEqual(5, throttle['searched'])
+        self.assertEqual(4, throttle['skipped.sampled'])
+        self.assertEqual(4, throttle['skipped'])
+
+    def test_max_line_rate(self):
+        local_printi = Printi()
+        local_printi.update_config(max_line_rate=3)
+
+        # Lines after the third in a second aren't searched
+        self.assertEqual(3, len(self.search(local_printi, [f'{pi / i}' for i in range(1, 6)])))
+
+        # Nor is anything in the next second, since the last one was too busy
+        self.now += 1_000_000_000
+        self.assertEqual([], self.search(local_printi, [f'{pi / 3}']))
+
+        # Once it's quiet, searching starts again
+        self.now += 1_000_000_000
+        self.assertEqual(1, len(self.search(local_printi, [f'{pi / 3}'])))
+        self.assertEqual(3, local_printi.stats()['throttle']['skipped.rate'])
+
+    def test_cpu_budget(self):
+        local_printi = Printi()
+        local_printi.update_config(cpu_budget=0.001)
+
+        # Once a millisecond has been spent, nothing else is searched this second.
+        # (The module is patched directly, since src.printi.printi is the printi instance.)
+        with patch.object(sys.modules['src.printi.printi'], 'thread_time_ns', side_effect=[0, 2_000_000]):
+            self.assertEqual(1, len(self.search(local_printi, [f'{pi / i}' for i in range(1, 4)])))
+
+        throttle = local_printi.stats()['throttle']
+        self.assertEqual(2, throttle['skipped.budget'])
+        self.assertEqual(2_000_000, throttle['cpu_ns'])
+
+        self.now += 1_000_000_000
+        self.assertEqual(1, len(self.search(local_printi, [f'{pi / 3}'])))
+
+        # Turning everything off removes the throttle
+        local_printi.update_config(cpu_budget=None)
+        self.assertIsNone(local_printi._throttle)
+
+
+if __name__ == '__main__':
+    unittest.main()